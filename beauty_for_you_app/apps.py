@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BeautyForYouAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'beauty_for_you_app'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
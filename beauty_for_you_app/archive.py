@@ -0,0 +1,61 @@
+import time as timer
+
+from django.db import connection, transaction
+
+from .models import Reservation, ReservationArchive
+from .schedule import deferred_refresh
+
+ARCHIVE_BATCH = 500
+
+
+def archive_rows(reservations):
+    return [
+        ReservationArchive(
+            id=reservation.pk,
+            client_id=reservation.client_id,
+            staff_id=reservation.staff_id,
+            staff_name=reservation.staff.name,
+            services=[service.name for service in reservation.service.all()],
+            category_services=[category.name for category in reservation.category_service.all()],
+            date=reservation.date,
+            time=reservation.time,
+        )
+        for reservation in reservations
+    ]
+
+
+def archive_batch(before, batch_size=ARCHIVE_BATCH):
+    """
+    Moves up to `batch_size` reservations dated before `before` to ReservationArchive in one
+    short transaction and returns how many were moved.
+
+    Reservations locked by a booking or a reschedule are skipped where the database supports
+    SKIP LOCKED, and moved by a later batch instead of being waited for.
+    """
+    with transaction.atomic(), deferred_refresh():
+        pks = Reservation.objects.filter(date__lt=before).order_by('pk')
+        if connection.features.has_select_for_update_skip_locked:
+            pks = pks.select_for_update(skip_locked=True)
+        pks = list(pks.values_list('pk', flat=True)[:batch_size])
+        if pks:
+            ReservationArchive.objects.bulk_create(
+                archive_rows(Reservation.objects.for_listing().filter(pk__in=pks)), ignore_conflicts=True
+            )
+            # Also drops the past days of the staff schedule, through the Reservation signals.
+            Reservation.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def archive_reservations(before, batch_size=ARCHIVE_BATCH, pause=0):
+    """
+    Archives all reservations dated before `before`, batch by batch, and yields the size of each batch.
+
+    Sleeping `pause` seconds between batches leaves room for the bookings competing for the table.
+    """
+    while True:
+        moved = archive_batch(before, batch_size)
+        if not moved:
+            return
+        yield moved
+        if pause:
+            timer.sleep(pause)
@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils.crypto import constant_time_compare
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def can_authenticate(backend_path, user):
+    """
+    Applies the user_can_authenticate() check of the backend, if it has one, as its get_user() would.
+    """
+    user_can_authenticate = getattr(auth.load_backend(backend_path), 'user_can_authenticate', None)
+    return user_can_authenticate is None or user_can_authenticate(user)
+
+
+def get_cached_user(request):
+    """
+    Returns the logged-in user like django.contrib.auth.get_user(), reading it from the cache.
+
+    A cached user is only returned for a session whose auth hash matches it, so changing the
+    password still logs out the other sessions. Everything else, e.g. a hash signed with a
+    fallback secret, goes through get_user(), which then fills the cache. The entry is deleted
+    when the user is saved or deleted, see signals.forget_cached_user. A cached user the session's
+    backend no longer lets in, e.g. a deactivated one, is not returned either. With
+    settings.AUTH_USER_CACHE_TIMEOUT = 0 this is get_user().
+    """
+    if not settings.AUTH_USER_CACHE_TIMEOUT:
+        return auth.get_user(request)
+    try:
+        user_id = request.session[SESSION_KEY]
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    user = cache.get(user_cache_key(user_id))
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if (user is not None and backend_path in settings.AUTHENTICATION_BACKENDS and session_hash
+            and constant_time_compare(session_hash, user.get_session_auth_hash())
+            and can_authenticate(backend_path, user)):
+        return user
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(user_cache_key(user.pk), user, settings.AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+def users_with_email(email, queryset=None):
+    """
+    Filters users by email ignoring case, as LOWER(email) = %s, which the user_email_lower_idx index
+    of migration 0010 serves.
+    """
+    queryset = User.objects.all() if queryset is None else queryset
+    return queryset.alias(email_lower=Lower('email')).filter(email_lower=email.lower())
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    """
+    Authenticates with a username or an email address, in one query using the username and
+    LOWER(email) indexes.
+
+    A username match wins over an email match, and an email shared by several accounts, which
+    UserCreateForm no longer allows, does not log in. Wrong credentials raise PermissionDenied,
+    which stops django.contrib.auth.authenticate() before ModelBackend, listed after this backend
+    for the sessions it logged in, hashes the password a second time.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        candidates = User.objects.alias(email_lower=Lower('email'))
+        if '@' in username:
+            candidates = candidates.filter(Q(username=username) | Q(email_lower=username.lower()))
+        else:
+            candidates = candidates.filter(username=username)
+        candidates = list(candidates[:3])
+        user = next((candidate for candidate in candidates if candidate.username == username), None)
+        if user is None and len(candidates) == 1:
+            user = candidates[0]
+        if user is None:
+            # Hash anyway, so the response time does not tell whether the account exists.
+            User().set_password(password)
+            raise PermissionDenied
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        raise PermissionDenied
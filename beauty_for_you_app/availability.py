@@ -0,0 +1,129 @@
+from datetime import timedelta
+from math import ceil
+
+from django.utils import timezone
+
+from .models import StaffDaySchedule
+
+OPENING_HOUR = 7
+CLOSING_HOUR = 16
+SLOT_MINUTES = 60
+ALL_TIMES = tuple(f'{hour:02d}:00' for hour in range(OPENING_HOUR, CLOSING_HOUR))
+
+
+def slots_needed(duration):
+    """
+    Returns the number of consecutive one-hour slots taken by a service lasting `duration` minutes.
+    """
+    return max(1, ceil((duration or SLOT_MINUTES) / SLOT_MINUTES))
+
+
+def slot_index(value):
+    """
+    Returns the position of a reservation time in ALL_TIMES, or None if it falls outside opening hours.
+    """
+    index = value.hour - OPENING_HOUR
+    if 0 <= index < len(ALL_TIMES):
+        return index
+    return None
+
+
+def working_days(date_from, date_to):
+    """
+    Yields every weekday between `date_from` and `date_to` (inclusive).
+    """
+    day = date_from
+    while day <= date_to:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+def slot_mask(start, duration):
+    """
+    Returns the bitmap of the slots taken by a reservation starting at `start` and lasting
+    `duration` minutes; bit i stands for ALL_TIMES[i]. Slots after closing time are ignored.
+    """
+    first = slot_index(start)
+    if first is None:
+        return 0
+    last = min(first + slots_needed(duration), len(ALL_TIMES))
+    return (1 << last) - (1 << first)
+
+
+def first_open_slot(day, now=None):
+    """
+    Returns the position in ALL_TIMES of the first slot of `day` that has not started yet at `now`,
+    the current local time by default; len(ALL_TIMES) for a day in the past.
+    """
+    now = timezone.localtime() if now is None else now
+    if day > now.date():
+        return 0
+    if day < now.date():
+        return len(ALL_TIMES)
+    return min(max(0, now.hour + 1 - OPENING_HOUR), len(ALL_TIMES))
+
+
+def fits(occupied, day, start, duration):
+    """
+    Tells whether a service of `duration` minutes starting at `start` on `day` fits in the free
+    slots of the day with the `occupied` bitmap, after now and before closing time.
+    """
+    first = slot_index(start)
+    return (first is not None and first >= first_open_slot(day) and first + slots_needed(duration) <= len(ALL_TIMES)
+            and not occupied & slot_mask(start, duration))
+
+
+def schedule_rows(staff_id, date_from, date_to):
+    """
+    Returns (date, occupied bitmap) rows of a staff member's schedule in a date range.
+    """
+    return (
+        StaffDaySchedule.objects
+        .filter(staff_id=staff_id, date__range=(date_from, date_to))
+        .values_list('date', 'occupied')
+    )
+
+
+def _free(occupied, date_from, date_to, duration, now):
+    needed = slots_needed(duration)
+    window = (1 << needed) - 1
+    result = {}
+    for day in working_days(date_from, date_to):
+        taken = occupied.get(day, 0)
+        result[day] = [
+            ALL_TIMES[start]
+            for start in range(first_open_slot(day, now), len(ALL_TIMES) - needed + 1)
+            if not taken & (window << start)
+        ]
+    return result
+
+
+def occupied_slots(staff_id, date_from, date_to):
+    """
+    Returns a mapping of date -> bitmap of occupied slots for a staff member.
+    """
+    return dict(schedule_rows(staff_id, date_from, date_to))
+
+
+async def aoccupied_slots(staff_id, date_from, date_to):
+    return {day: occupied async for day, occupied in schedule_rows(staff_id, date_from, date_to)}
+
+
+def free_slots(staff_id, date_from, date_to, duration=SLOT_MINUTES):
+    """
+    Returns a mapping of date -> list of free start times ('HH:MM') for a staff member.
+
+    A start time is free when the service of the given `duration` fits in consecutive free
+    slots before closing. Weekends, days in the past and today's slots that have already
+    started are skipped.
+    """
+    now = timezone.localtime()
+    date_from = max(date_from, now.date())
+    return _free(occupied_slots(staff_id, date_from, date_to), date_from, date_to, duration, now)
+
+
+async def afree_slots(staff_id, date_from, date_to, duration=SLOT_MINUTES):
+    now = timezone.localtime()
+    date_from = max(date_from, now.date())
+    return _free(await aoccupied_slots(staff_id, date_from, date_to), date_from, date_to, duration, now)
@@ -0,0 +1,206 @@
+from datetime import date, datetime
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+
+from .availability import ALL_TIMES, fits, slot_mask
+from .cache import staff_category_map
+from .models import Category_service, Reservation, Services, Staff, StaffDaySchedule
+from .schedule import deferred_refresh, lock_day, lock_days, refresh_schedule
+
+MAX_BULK_ITEMS = 20
+
+
+class BookingError(Exception):
+    """
+    Raised when a booking request cannot be fulfilled; `status` is the HTTP status to answer with.
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def validate_booking_date(selected_date):
+    """
+    Raises BookingError when the salon does not take bookings on `selected_date`.
+    """
+    if selected_date.weekday() >= 5:
+        raise BookingError('Nie pracujemy w weekendy')
+    if selected_date < date.today():
+        raise BookingError('data juz mineła')
+
+
+def parse_booking_items(items):
+    """
+    Validates the raw items of a bulk booking request and converts them to
+    dicts with integer ids, a `date` and a `time`.
+    """
+    if not isinstance(items, list) or not items:
+        raise BookingError('Brak usług do zarezerwowania')
+    if len(items) > MAX_BULK_ITEMS:
+        raise BookingError(f'Można zarezerwować najwyżej {MAX_BULK_ITEMS} usług naraz')
+
+    parsed = []
+    for item in items:
+        try:
+            selected_date = datetime.strptime(item['date'], '%Y-%m-%d').date()
+            selected_time = forms.TimeField().clean(item['time'])
+            parsed.append({
+                'staff': int(item['staff']),
+                'service': int(item['service']),
+                'category_service': int(item['category_service']),
+                'date': selected_date,
+                'time': selected_time,
+            })
+        except (KeyError, TypeError, ValueError, ValidationError):
+            raise BookingError('Nieprawidłowe dane rezerwacji')
+        validate_booking_date(selected_date)
+        if selected_time.strftime('%H:%M') not in ALL_TIMES:
+            raise BookingError('Nieprawidłowa godzina')
+
+    slots = {(item['staff'], item['date'], item['time']) for item in parsed}
+    if len(slots) != len(parsed):
+        raise BookingError('Ten sam termin został wybrany kilka razy')
+    return parsed
+
+
+def book_reservation(client, staff, service, category_service, selected_date, selected_time):
+    """
+    Creates a single reservation with its service and category in one transaction.
+
+    `staff`, `service` and `category_service` may be instances or primary keys, `selected_time`
+    a time or an 'HH:MM' string as offered by the booking form. The schedule row of the day is
+    locked with lock_day and the service has to fit in its free slots, so concurrent bookings and
+    moves into that day wait for each other. The day's bitmap read under the lock is updated
+    directly, and the reservation and its through rows are inserted with bulk_create, without
+    the signals refreshing the schedule from the reservations table.
+    Raises BookingError (409) when the slot was taken in the meantime.
+    """
+    staff_id = getattr(staff, 'pk', staff)
+    if isinstance(selected_time, str):
+        selected_time = datetime.strptime(selected_time, '%H:%M').time()
+    duration = getattr(service, 'duration', None)
+    if duration is None:
+        duration = Services.objects.filter(pk=service).values_list('duration', flat=True).first()
+    reservation = Reservation(client=client, staff_id=staff_id, date=selected_date, time=selected_time)
+    try:
+        with transaction.atomic():
+            occupied = lock_day(staff_id, selected_date)
+            if not fits(occupied, selected_date, selected_time, duration):
+                raise BookingError('Ten termin jest już zajęty', status=409)
+            Reservation.objects.bulk_create([reservation])
+            Reservation.service.through.objects.create(reservation_id=reservation.pk,
+                                                       services_id=getattr(service, 'pk', service))
+            Reservation.category_service.through.objects.create(
+                reservation_id=reservation.pk, category_service_id=getattr(category_service, 'pk', category_service))
+            StaffDaySchedule.objects.filter(staff_id=staff_id, date=selected_date).update(
+                occupied=occupied | slot_mask(selected_time, duration))
+    except IntegrityError:
+        raise BookingError('Ten termin jest już zajęty', status=409)
+    return reservation
+
+
+def reschedule_reservation(client, reservation_id, selected_date, selected_time):
+    """
+    Moves one of the client's reservations to another date and time.
+
+    The reservation row and the schedule rows of the current and the target day are locked
+    with SELECT ... FOR UPDATE, the days with lock_days, so concurrent bookings of either day
+    wait for this one and availability is checked against committed data. Only the one
+    reservation row is written.
+    Raises BookingError with status 404 for a foreign reservation and 409 for a taken slot.
+    """
+    with transaction.atomic(), deferred_refresh():
+        reservation = Reservation.objects.select_for_update().filter(pk=reservation_id, client=client).first()
+        if reservation is None:
+            raise BookingError('Nie znaleziono rezerwacji', status=404)
+        # FOR UPDATE cannot be combined with GROUP BY, so the duration is a separate query.
+        duration = reservation.service.aggregate(total=Sum('duration'))['total']
+
+        days = lock_days({(reservation.staff_id, reservation.date), (reservation.staff_id, selected_date)})
+        occupied = days[reservation.staff_id, selected_date]
+        if reservation.date == selected_date and reservation.time:
+            occupied &= ~slot_mask(reservation.time, duration)
+        if not fits(occupied, selected_date, selected_time, duration):
+            raise BookingError('Ten termin jest już zajęty', status=409)
+
+        try:
+            with transaction.atomic():
+                Reservation.objects.filter(pk=reservation.pk).update(date=selected_date, time=selected_time)
+        except IntegrityError:
+            raise BookingError('Ten termin jest już zajęty', status=409)
+        # update() sends no signals, so both days are refreshed here.
+        refresh_schedule({(reservation.staff_id, reservation.date), (reservation.staff_id, selected_date)})
+    reservation.date, reservation.time = selected_date, selected_time
+    return reservation
+
+
+def create_reservations(client, items):
+    """
+    Books several services at once and returns the created reservations.
+
+    Staff, services and categories are resolved by primary key in one query each,
+    the schedule rows of all booked days are locked with lock_days, and the reservations
+    and both many-to-many through tables are inserted with bulk_create inside a single
+    transaction, so the number of queries does not depend on the number of items.
+    Raises BookingError when items overlap each other and with status 409 when they
+    overlap an existing reservation.
+    """
+    staff_ids = {item['staff'] for item in items}
+    service_ids = {item['service'] for item in items}
+    category_ids = {item['category_service'] for item in items}
+
+    staff = Staff.objects.in_bulk(staff_ids)
+    services = Services.objects.in_bulk(service_ids)
+    categories = Category_service.objects.in_bulk(category_ids)
+    if len(staff) != len(staff_ids) or len(services) != len(service_ids) or len(categories) != len(category_ids):
+        raise BookingError('Nie znaleziono pracownika, usługi lub kategorii', status=404)
+
+    service_categories = set(
+        Services.category.through.objects
+        .filter(services_id__in=service_ids, category_service_id__in=category_ids)
+        .values_list('services_id', 'category_service_id')
+    )
+    staff_categories = staff_category_map()
+    for item in items:
+        if (item['service'], item['category_service']) not in service_categories:
+            raise BookingError('Usługa nie należy do wybranej kategorii')
+        if item['staff'] not in staff_categories.get(item['category_service'], ()):
+            raise BookingError('Pracownik nie wykonuje usług z wybranej kategorii')
+
+    requested = {}
+    for item in items:
+        day = (item['staff'], item['date'])
+        mask = slot_mask(item['time'], services[item['service']].duration)
+        if requested.get(day, 0) & mask:
+            raise BookingError('Wybrane usługi nakładają się w czasie')
+        requested[day] = requested.get(day, 0) | mask
+
+    reservations = [
+        Reservation(client=client, staff=staff[item['staff']], date=item['date'], time=item['time'])
+        for item in items
+    ]
+    try:
+        with transaction.atomic():
+            occupied = lock_days(requested)
+            if any(occupied[day] & mask for day, mask in requested.items()):
+                raise BookingError('Ten termin jest już zajęty', status=409)
+            Reservation.objects.bulk_create(reservations)
+            Reservation.service.through.objects.bulk_create(
+                Reservation.service.through(reservation_id=reservation.pk, services_id=item['service'])
+                for reservation, item in zip(reservations, items)
+            )
+            Reservation.category_service.through.objects.bulk_create(
+                Reservation.category_service.through(reservation_id=reservation.pk,
+                                                     category_service_id=item['category_service'])
+                for reservation, item in zip(reservations, items)
+            )
+            # bulk_create sends no signals, so the schedule is refreshed here.
+            refresh_schedule((item['staff'], item['date']) for item in items)
+    except IntegrityError:
+        raise BookingError('Ten termin jest już zajęty', status=409)
+    return reservations
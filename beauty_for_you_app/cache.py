@@ -0,0 +1,173 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Category, Category_service, Product, Services, Staff, StaffCategory
+from .routers import pin_catalog_reads
+
+CATALOG_QUERYSETS = {
+    'category_service': lambda: Category_service.objects.all(),
+    'services': lambda: Services.objects.for_listing(),
+    'staff': lambda: Staff.objects.all(),
+    'shop_categories': lambda: Category.objects.order_by('category_name', 'pk'),
+}
+
+# Catalogs to invalidate when a model changes; services list the names of their categories
+# and products the names of their shop categories. 'products' only versions template fragments.
+MODEL_CATALOGS = {
+    Category_service: ('category_service', 'services'),
+    Services: ('services',),
+    Staff: ('staff',),
+    Product: ('products',),
+    Category: ('products', 'shop_categories'),
+    StaffCategory: ('staff_categories',),
+}
+
+
+def _incr(key, delta=1, timeout=None):
+    """
+    Atomically increments a counter kept in the cache, creating it when missing.
+    """
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, timeout=timeout):
+            return delta
+        return cache.incr(key, delta)
+
+
+def _new_version():
+    # A version key evicted from the cache restarts from the current time, not from 1, so it
+    # cannot match the keys of entries cached under its earlier values.
+    return time.time_ns() // 1000
+
+
+def catalog_version(name):
+    """
+    Returns the current version counter of a catalog; it is part of every cache key of that catalog.
+    """
+    version = cache.get(f'catalog:version:{name}')
+    if version is None:
+        version = _new_version()
+        cache.add(f'catalog:version:{name}', version, timeout=None)
+        version = cache.get(f'catalog:version:{name}', version)
+    return version
+
+
+async def acatalog_version(name):
+    version = await cache.aget(f'catalog:version:{name}')
+    if version is None:
+        version = _new_version()
+        await cache.aadd(f'catalog:version:{name}', version, timeout=None)
+        version = await cache.aget(f'catalog:version:{name}', version)
+    return version
+
+
+def bump_catalog(*names):
+    """
+    Invalidates catalogs by bumping their version, so stale entries are never read again.
+    """
+    for name in names:
+        try:
+            cache.incr(f'catalog:version:{name}')
+        except ValueError:
+            cache.add(f'catalog:version:{name}', _new_version(), timeout=None)
+    pin_catalog_reads()
+
+
+def get_catalog(name):
+    """
+    Returns the list of objects of a catalog, from cache when possible.
+    """
+    key = f'catalog:{name}:{catalog_version(name)}'
+    objects = cache.get(key)
+    if objects is None:
+        _incr(f'catalog:misses:{name}')
+        objects = list(CATALOG_QUERYSETS[name]())
+        cache.set(key, objects, settings.CATALOG_CACHE_TIMEOUT)
+    else:
+        _incr(f'catalog:hits:{name}')
+    return objects
+
+
+def catalog_stats():
+    """
+    Returns hit/miss counters and the hit rate of every catalog.
+    """
+    stats = {}
+    for name in CATALOG_QUERYSETS:
+        hits = cache.get(f'catalog:hits:{name}', 0)
+        misses = cache.get(f'catalog:misses:{name}', 0)
+        total = hits + misses
+        stats[name] = {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else None}
+    return stats
+
+
+def _staff_category_pairs():
+    return (
+        StaffCategory.objects
+        .order_by('category_service_id', 'staff_id')
+        .values_list('category_service_id', 'staff_id')
+    )
+
+
+def _staff_category_map(pairs):
+    mapping = {}
+    for category_service_id, staff_id in pairs:
+        mapping.setdefault(category_service_id, []).append(staff_id)
+    return mapping
+
+
+def staff_category_map():
+    """
+    Returns {category_service_id: [staff ids]} - who performs the services of every category.
+
+    Built from StaffCategory in one query and cached until an assignment changes, so the booking
+    pages find eligible staff without joining the assignments.
+    """
+    key = f'staff_categories:{catalog_version("staff_categories")}'
+    mapping = cache.get(key)
+    if mapping is None:
+        mapping = _staff_category_map(_staff_category_pairs())
+        cache.set(key, mapping, settings.CATALOG_CACHE_TIMEOUT)
+    return mapping
+
+
+async def astaff_category_map():
+    key = f'staff_categories:{await acatalog_version("staff_categories")}'
+    mapping = await cache.aget(key)
+    if mapping is None:
+        mapping = _staff_category_map([pair async for pair in _staff_category_pairs()])
+        await cache.aset(key, mapping, settings.CATALOG_CACHE_TIMEOUT)
+    return mapping
+
+
+def _category_service_ids(category_service_id):
+    return (
+        Services.category.through.objects
+        .filter(category_service_id=category_service_id)
+        .values_list('services_id', flat=True)
+    )
+
+
+def category_choice_ids(category_service_id):
+    """
+    Returns {'staff': [...], 'service': [...]} - ids of the staff members and services
+    that can be booked in a category, cached until staff or services are reassigned.
+    """
+    key = f'category_choices:{category_service_id}:{catalog_version("category_choices")}'
+    service_ids = cache.get(key)
+    if service_ids is None:
+        service_ids = list(_category_service_ids(category_service_id))
+        cache.set(key, service_ids, settings.CATALOG_CACHE_TIMEOUT)
+    return {'staff': staff_category_map().get(category_service_id, []), 'service': service_ids}
+
+
+async def acategory_choice_ids(category_service_id):
+    key = f'category_choices:{category_service_id}:{await acatalog_version("category_choices")}'
+    service_ids = await cache.aget(key)
+    if service_ids is None:
+        service_ids = [pk async for pk in _category_service_ids(category_service_id)]
+        await cache.aset(key, service_ids, settings.CATALOG_CACHE_TIMEOUT)
+    return {'staff': (await astaff_category_map()).get(category_service_id, []), 'service': service_ids}
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.core.checks import Error, Info, Warning, register
+from django.db import connections
+
+
+def describe_connection(alias):
+    """
+    Returns the effective connection management settings of a database as text.
+    """
+    settings_dict = connections.settings[alias]
+    max_age = settings_dict['CONN_MAX_AGE']
+    if max_age is None:
+        reuse = 'persistent connections without a time limit'
+    elif max_age:
+        reuse = f'persistent connections, reused for {max_age}s'
+    else:
+        reuse = 'a new connection per request'
+    return (
+        f"{alias} ({settings_dict['ENGINE'].rsplit('.', 1)[-1]}, {settings_dict['HOST'] or 'local'}): {reuse}, "
+        f"health checks {'on' if settings_dict['CONN_HEALTH_CHECKS'] else 'off'}, "
+        f"server-side cursors {'off' if settings_dict.get('DISABLE_SERVER_SIDE_CURSORS') else 'on'}"
+    )
+
+
+@register('database_connections')
+def check_connection_settings(app_configs, **kwargs):
+    errors = []
+    for alias in connections:
+        settings_dict = connections.settings[alias]
+        if settings_dict['CONN_MAX_AGE'] != 0 and not settings_dict['CONN_HEALTH_CHECKS']:
+            errors.append(Warning(
+                f'Persistent connections of the {alias} database are reused without health checks.',
+                hint='A connection dropped by the server or a pooler fails the next request; '
+                     'set CONN_HEALTH_CHECKS to True.',
+                id='beauty_for_you_app.W001',
+            ))
+    return errors
+
+
+@register('database_connections', deploy=True)
+def report_connection_settings(app_configs, **kwargs):
+    return [Info(describe_connection(alias), id='beauty_for_you_app.I001') for alias in connections]
+
+
+@register('caches', deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.SHARED_CACHE:
+        return []
+    return [Warning(
+        'The default cache is private to each worker process.',
+        hint='Catalog invalidations only reach the worker that saved the change, so catalogs are cached for '
+             f'{settings.CATALOG_CACHE_TIMEOUT}s only, and every worker keeps its own THROTTLE_RATES buckets, '
+             'so clients get the rates once per worker; set CACHE_BACKEND and CACHE_LOCATION to a shared cache, '
+             'e.g. Redis or Memcached.',
+        id='beauty_for_you_app.W002',
+    )]
+
+
+CACHED_SESSION_ENGINES = ('django.contrib.sessions.backends.cache', 'django.contrib.sessions.backends.cached_db')
+
+
+@register('caches')
+def check_cached_sessions(app_configs, **kwargs):
+    if settings.SHARED_CACHE:
+        return []
+    errors = []
+    if settings.SESSION_ENGINE in CACHED_SESSION_ENGINES:
+        errors.append(Error(
+            f'{settings.SESSION_ENGINE} keeps sessions in a cache private to each worker process.',
+            hint='A logout only leaves the cache of the worker that handled it, so the others still accept the '
+                 'session; set SESSION_STORE to db or signed_cookies, or use a shared cache.',
+            id='beauty_for_you_app.E001',
+        ))
+    if settings.AUTH_USER_CACHE_TIMEOUT:
+        errors.append(Error(
+            'CachedAuthenticationMiddleware keeps users in a cache private to each worker process.',
+            hint='Deactivating a user or changing their password only drops the entry of the worker that saved '
+                 'it; set AUTH_USER_CACHE_TIMEOUT to 0, or use a shared cache.',
+            id='beauty_for_you_app.E002',
+        ))
+    return errors
@@ -0,0 +1,66 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, Max, Value
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+
+def _deleted_key(model):
+    return f'catalog:deleted:{model._meta.label_lower}'
+
+
+def mark_deleted(model):
+    """
+    Records when a row of `model` was last deleted; MAX(updated_at) cannot see deletions.
+    """
+    cache.set(_deleted_key(model), timezone.now(), timeout=None)
+
+
+def catalog_state(models):
+    """
+    Returns [(last updated_at, row count)] of each model, in one UNION ALL query.
+    """
+    querysets = [
+        model.objects.order_by()
+        .annotate(catalog_position=Value(position, output_field=IntegerField())).values('catalog_position')
+        .annotate(last=Max('updated_at'), count=Count('pk'))
+        .values_list('catalog_position', 'last', 'count')
+        for position, model in enumerate(models)
+    ]
+    rows = sorted(querysets[0].union(*querysets[1:], all=True))
+    deleted = cache.get_many([_deleted_key(model) for model in models])
+    state = []
+    for model, (position, last, count) in zip(models, rows):
+        deleted_at = deleted.get(_deleted_key(model))
+        if deleted_at and (last is None or deleted_at > last):
+            last = deleted_at
+        state.append((last, count))
+    return state
+
+
+def catalog_condition(*models):
+    """
+    Decorator for catalog page views answering conditional GET requests with 304 Not Modified.
+
+    ETag and Last-Modified come from MAX(updated_at) and COUNT(*) of the models shown on the
+    page, read with a single query; the view and its template only run when they changed.
+    The ETag also covers the user and their is_staff flag, which change the page header and
+    the admin buttons.
+    """
+    def state(request):
+        if not hasattr(request, '_catalog_state'):
+            request._catalog_state = catalog_state(models)
+        return request._catalog_state
+
+    def etag(request, *args, **kwargs):
+        parts = [settings.ETAG_RELEASE, request.user.pk, request.user.is_staff]
+        parts += [(last.isoformat() if last else None, count) for last, count in state(request)]
+        return hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        changes = [last for last, count in state(request) if last]
+        return max(changes) if changes else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
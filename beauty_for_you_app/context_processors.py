@@ -0,0 +1,25 @@
+from django.conf import settings
+
+from .cache import catalog_version
+
+
+class CatalogVersions:
+    """
+    Template access to catalog versions, e.g. `catalog_versions.staff`.
+
+    Versions are read from the cache only when a template asks for them, so pages without
+    cached fragments pay nothing.
+    """
+
+    def __getitem__(self, name):
+        return catalog_version(name)
+
+
+def catalog_cache(request):
+    """
+    Adds what the `{% cache %}` fragments of the catalog pages are keyed and timed on.
+    """
+    return {
+        'catalog_versions': CatalogVersions(),
+        'catalog_cache_timeout': settings.CATALOG_CACHE_TIMEOUT,
+    }
@@ -0,0 +1,124 @@
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .models import Product, Reservation
+
+EXPORT_CHUNK = 2000
+EXPORT_FORMATS = {'csv': 'text/csv; charset=utf-8', 'json': 'application/json'}
+RESERVATION_FIELDS = ('id', 'date', 'time', 'client', 'staff', 'services', 'category_services')
+PRODUCT_FIELDS = ('id', 'name', 'description', 'price', 'categories')
+
+
+class Echo:
+    """
+    File-like object returning what is written to it, so csv.writer produces lines to stream.
+    """
+
+    def write(self, value):
+        return value
+
+
+def reservation_records(queryset=None):
+    """
+    Yields every reservation as a flat dict, reading the table with a server-side cursor.
+
+    Staff and client are joined; services and categories are prefetched once per chunk of
+    EXPORT_CHUNK reservations, so memory stays constant however many rows are exported.
+    """
+    queryset = Reservation.objects.all() if queryset is None else queryset
+    reservations = queryset.for_listing().select_related('client').order_by('pk')
+    for reservation in reservations.iterator(chunk_size=EXPORT_CHUNK):
+        yield {
+            'id': reservation.pk,
+            'date': reservation.date,
+            'time': reservation.time,
+            'client': reservation.client.username,
+            'staff': reservation.staff.name,
+            'services': ', '.join(service.name for service in reservation.service.all()),
+            'category_services': ', '.join(category.name for category in reservation.category_service.all()),
+        }
+
+
+def product_records(queryset=None):
+    """
+    Yields every product as a flat dict, with its categories prefetched per chunk.
+    """
+    queryset = Product.objects.all() if queryset is None else queryset
+    for product in queryset.for_listing().order_by('pk').iterator(chunk_size=EXPORT_CHUNK):
+        yield {
+            'id': product.pk,
+            'name': product.name,
+            'description': product.description,
+            'price': product.price,
+            'categories': ', '.join(category.category_name for category in product.categories.all()),
+        }
+
+
+def csv_lines(records, fields):
+    writer = csv.DictWriter(Echo(), fieldnames=fields)
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+
+def json_lines(records):
+    """
+    Yields a JSON array of the records, one record per line.
+    """
+    separator = '[\n'
+    for record in records:
+        yield separator + json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False)
+        separator = ',\n'
+    yield '[]\n' if separator == '[\n' else '\n]\n'
+
+
+def batched(lines, size):
+    """
+    Joins the lines into blocks of `size`, so the server writes a block per chunk of rows, not per row.
+    """
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+async def aiterate(blocks):
+    """
+    Serves a synchronous generator to an ASGI server without buffering it.
+
+    Django 4.2 would collect a synchronous iterator into a list under ASGI, and QuerySet.aiterator()
+    does not support prefetch_related yet, so every block is produced in the ORM's sync thread.
+    """
+    blocks = iter(blocks)
+    next_block = sync_to_async(next)
+    while True:
+        block = await next_block(blocks, None)
+        if block is None:
+            return
+        yield block
+
+
+def export_response(request, records, fields, filename, export_format):
+    """
+    Returns a StreamingHttpResponse sending the records as a CSV or JSON attachment.
+
+    Nothing is read before the server starts iterating the response, and the first block is
+    sent as soon as the first chunk of rows is fetched.
+    """
+    lines = csv_lines(records, fields) if export_format == 'csv' else json_lines(records)
+    blocks = batched(lines, EXPORT_CHUNK)
+    response = StreamingHttpResponse(
+        aiterate(blocks) if isinstance(request, ASGIRequest) else blocks,
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -2,7 +2,11 @@ from django import forms
 from django.contrib.auth.models import User
 from django.forms import TextInput
 
-from .models import Staff, Services, Category_service, Reservation, Category, Product, Category_staff
+from .auth import users_with_email
+from .availability import ALL_TIMES
+from .booking import BookingError, validate_booking_date
+from .cache import category_choice_ids, get_catalog
+from .models import Staff, Services, Category_service, Reservation, Category, Product, StaffCategory
 
 
 class AddStaffForm(forms.ModelForm):
@@ -64,6 +68,12 @@ class UserCreateForm(forms.ModelForm):
 
         }
 
+    def clean_email(self):
+        email = self.cleaned_data['email']
+        if email and users_with_email(email).exists():
+            raise forms.ValidationError('Konto z tym adresem email już istnieje')
+        return email
+
     def clean(self):
         cleaned_data = super().clean()
         password = cleaned_data.get('password')
@@ -78,7 +88,7 @@ class UserCreateForm(forms.ModelForm):
 class LoginForm(forms.Form):
     login = forms.CharField(label='email', widget=forms.TextInput(attrs={
         'class': 'form-control',
-        "placeholder": "username"}))
+        "placeholder": "username lub email"}))
 
     password = forms.CharField(label="Password confirmation", widget=forms.PasswordInput(attrs={
         'class': 'form-control',
@@ -94,6 +104,55 @@ class ReservationForm(forms.ModelForm):
             'time':forms.TimeInput(attrs={'type':'time'})
         }
 
+class ReservationBookingForm(forms.Form):
+    """
+    Booking form of a single service; staff and service are chosen by primary key
+    among the ones assigned to the booked category. Whether the slot is free is checked
+    by book_reservation, under the lock of the day.
+    """
+    staff = forms.ModelChoiceField(queryset=Staff.objects.none(), label='Pracownik')
+    service = forms.ModelChoiceField(queryset=Services.objects.none(), label='Usługa')
+    date = forms.DateField(label='Data', widget=forms.DateInput(attrs={'type': 'date'}))
+    time = forms.ChoiceField(choices=[(time, time) for time in ALL_TIMES], label='Godzina')
+
+    def __init__(self, *args, category_service_id, **kwargs):
+        super().__init__(*args, **kwargs)
+        choices = category_choice_ids(category_service_id)
+        self.fields['staff'].queryset = Staff.objects.filter(pk__in=choices['staff']).order_by('last_name', 'pk')
+        self.fields['service'].queryset = Services.objects.filter(pk__in=choices['service']).order_by('name', 'pk')
+
+    def clean_date(self):
+        selected_date = self.cleaned_data['date']
+        try:
+            validate_booking_date(selected_date)
+        except BookingError as error:
+            raise forms.ValidationError(error.message)
+        return selected_date
+
+
+
+class ReservationRescheduleForm(forms.Form):
+    """
+    New date and time of an existing reservation.
+    """
+    date = forms.DateField(label='Data', widget=forms.DateInput(attrs={'type': 'date'}))
+    time = forms.TimeField(label='Godzina', widget=forms.Select(choices=[(time, time) for time in ALL_TIMES]))
+
+    def clean_date(self):
+        selected_date = self.cleaned_data['date']
+        try:
+            validate_booking_date(selected_date)
+        except BookingError as error:
+            raise forms.ValidationError(error.message)
+        return selected_date
+
+    def clean_time(self):
+        selected_time = self.cleaned_data['time']
+        if selected_time.strftime('%H:%M') not in ALL_TIMES:
+            raise forms.ValidationError('Nieprawidłowa godzina')
+        return selected_time
+
+
 class AddCategoryShopForm(forms.ModelForm):
     class Meta:
         model = Category
@@ -106,11 +165,33 @@ class AddProductShopForm(forms.ModelForm):
         fields = ('name', 'description', 'price', 'categories')
 
 
+class ProductSearchForm(forms.Form):
+    """
+    Shop search: words of the product name or description, a shop category and a price range.
+    """
+    query = forms.CharField(required=False, max_length=100, label='Szukaj')
+    category = forms.TypedChoiceField(required=False, coerce=int, empty_value=None, label='Kategoria')
+    min_price = forms.DecimalField(required=False, min_value=0, decimal_places=2, label='Cena od')
+    max_price = forms.DecimalField(required=False, min_value=0, decimal_places=2, label='Cena do')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['category'].choices = [('', 'Wszystkie')] + [
+            (category.pk, category.category_name) for category in get_catalog('shop_categories')
+        ]
+
+
 class UserUpdateForm(forms.ModelForm):
     class Meta:
         model = User
         fields = ['first_name', 'last_name', 'email']
 
+    def clean_email(self):
+        email = self.cleaned_data['email']
+        if email and users_with_email(email).exclude(pk=self.instance.pk).exists():
+            raise forms.ValidationError('Konto z tym adresem email już istnieje')
+        return email
+
 
 class PasswordResetForm(forms.Form):
     password = forms.CharField(label="Haslo", widget=forms.PasswordInput(attrs={
@@ -128,5 +209,5 @@ class PasswordResetForm(forms.Form):
 
 class AddStaffToCategoryForm(forms.ModelForm):
     class Meta:
-        model = Category_staff
-        fields = ('name', 'staff')
+        model = StaffCategory
+        fields = ('category_service', 'staff')
@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from beauty_for_you_app.archive import ARCHIVE_BATCH, archive_reservations
+
+
+class Command(BaseCommand):
+    help = ('Moves past reservations to the ReservationArchive table in small batches, each in its own '
+            'short transaction. Meant to run daily, e.g. from the Heroku Scheduler.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', type=date.fromisoformat, default=None,
+                            help='Archive reservations dated before this day (YYYY-MM-DD), by default today.')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH)
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches.')
+
+    def handle(self, *args, **options):
+        before = options['before'] or date.today()
+        total = 0
+        for moved in archive_reservations(before, options['batch_size'], options['pause']):
+            total += moved
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Archived {total} reservations...')
+        self.stdout.write(f'Archived {total} reservations dated before {before}.')
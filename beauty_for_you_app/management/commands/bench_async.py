@@ -0,0 +1,123 @@
+import asyncio
+import json
+import logging
+import time as timer
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+
+from beauty_for_you_app.models import Staff
+from beauty_for_you_app.seeding import Seeder
+
+from .benchmark import percentile
+
+
+class Command(BaseCommand):
+    help = ('Compares the synchronous availability view served by a fixed number of worker threads '
+            'with its async version served by the ASGI application on one event loop, while every '
+            'SQL query is delayed to simulate a remote database. Runs on a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--latency', type=float, default=20, help='Simulated latency of every query in ms.')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=4, help='Threads serving the sync view.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once.')
+        parser.add_argument('--reservations', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        logging.getLogger('beauty_for_you_app.queries').setLevel(logging.ERROR)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            Seeder().seed(staff=10, services=20, users=50, products=0, reservations=options['reservations'])
+            staff_ids = list(Staff.objects.values_list('pk', flat=True))
+            latency = options['latency'] / 1000
+
+            def delay(execute, sql, params, many, context):
+                timer.sleep(latency)
+                return execute(sql, params, many, context)
+
+            def add_latency(sender, connection, **kwargs):
+                # Wrappers installed by middleware are popped from the end when the request finishes.
+                if delay not in connection.execute_wrappers:
+                    connection.execute_wrappers.insert(0, delay)
+
+            connections.close_all()
+            connection_created.connect(add_latency)
+            try:
+                with override_settings(DEBUG=False):
+                    report = {
+                        'latency_ms': options['latency'],
+                        'sync': self.run_sync(staff_ids, options),
+                        'async': asyncio.run(self.run_async(staff_ids, options)),
+                    }
+            finally:
+                connection_created.disconnect(add_latency)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def summary(self, samples, wall):
+        latencies = [elapsed for elapsed, status in samples]
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for elapsed, status in samples if status >= 400),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'requests_per_second': round(len(samples) / wall, 1),
+        }
+
+    def run_sync(self, staff_ids, options):
+        def request(client, number):
+            began = timer.perf_counter()
+            response = client.get(f'/availability/{staff_ids[number % len(staff_ids)]}/')
+            return (timer.perf_counter() - began) * 1000, response.status_code
+
+        def worker(numbers):
+            client = Client()
+            try:
+                return [request(client, number) for number in numbers]
+            finally:
+                connections.close_all()
+
+        workers = options['workers']
+        began = timer.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            chunks = [range(start, options['requests'], workers) for start in range(workers)]
+            samples = [sample for result in executor.map(worker, chunks) for sample in result]
+        return dict(self.summary(samples, timer.perf_counter() - began), workers=workers)
+
+    async def run_async(self, staff_ids, options):
+        application = get_asgi_application()
+        limit = asyncio.Semaphore(options['concurrency'])
+
+        async def request(number):
+            path = f'/api/availability/{staff_ids[number % len(staff_ids)]}/'
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+                'root_path': '', 'headers': [(b'host', b'localhost')],
+                'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+            }
+            status = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            async with limit:
+                began = timer.perf_counter()
+                await application(scope, receive, send)
+                return (timer.perf_counter() - began) * 1000, status[0]
+
+        began = timer.perf_counter()
+        samples = await asyncio.gather(*(request(number) for number in range(options['requests'])))
+        return dict(self.summary(samples, timer.perf_counter() - began), concurrency=options['concurrency'])
@@ -0,0 +1,83 @@
+import json
+import statistics
+import time as timer
+from datetime import date, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from beauty_for_you_app.availability import ALL_TIMES, OPENING_HOUR, free_slots, working_days
+from beauty_for_you_app.models import Reservation, Services, Staff
+
+
+class Command(BaseCommand):
+    help = ('Measures free_slots() latency while the reservation table grows. '
+            'All generated data is rolled back at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma separated reservation counts to measure at.')
+        parser.add_argument('--staff', type=int, default=200, help='Number of staff members to spread bookings over.')
+        parser.add_argument('--repeat', type=int, default=50, help='Lookups per measurement.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        with transaction.atomic():
+            results = self.run(sizes, options)
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, sizes, options):
+        client = User.objects.create_user(username='bench_availability')
+        staff = Staff.objects.bulk_create(
+            Staff(first_name='Bench', last_name=str(i), phone='123456789', position=1)
+            for i in range(options['staff'])
+        )
+        services = Services.objects.bulk_create([
+            Services(name='Bench 60', price=100, duration=60),
+            Services(name='Bench 120', price=180, duration=120),
+        ])
+        days = list(working_days(date.today() + timedelta(days=1), date.today() + timedelta(days=3650)))
+        # Every staff member gets every other hour booked, day after day, so each
+        # (staff, date, time) tuple is unique no matter how large the table grows.
+        hours = range(0, len(ALL_TIMES), 2)
+        per_day = len(staff) * len(hours)
+
+        created = 0
+        results = []
+        for size in sizes:
+            while created < size:
+                count = min(options['batch_size'], size - created)
+                reservations = []
+                for number in range(created, created + count):
+                    day, rest = divmod(number, per_day)
+                    person, hour = divmod(rest, len(hours))
+                    reservations.append(Reservation(
+                        client=client,
+                        staff=staff[person],
+                        date=days[day],
+                        time=time(OPENING_HOUR + hours[hour]),
+                    ))
+                Reservation.objects.bulk_create(reservations)
+                Reservation.service.through.objects.bulk_create(
+                    Reservation.service.through(reservation_id=reservation.pk, services_id=services[i % 2].pk)
+                    for i, reservation in enumerate(reservations)
+                )
+                created += count
+
+            target = staff[len(staff) // 2].pk
+            start = days[0]
+            timings = []
+            for _ in range(options['repeat']):
+                began = timer.perf_counter()
+                free_slots(target, start, start + timedelta(days=6), duration=90)
+                timings.append((timer.perf_counter() - began) * 1000)
+            results.append({
+                'reservations': created,
+                'p50_ms': round(statistics.median(timings), 3),
+                'max_ms': round(max(timings), 3),
+            })
+            self.stderr.write(f'{created} reservations: p50 {results[-1]["p50_ms"]} ms')
+        return results
@@ -0,0 +1,63 @@
+import json
+import time as timer
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from beauty_for_you_app.cache import catalog_stats
+from beauty_for_you_app.models import Category_service, Services, Staff
+
+from .benchmark import throwaway_environment
+
+URLS = ('/', '/staff/', '/service/', '/category_service/')
+DUMMY_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = ('Compares throughput of the catalog pages with and without the catalog cache. '
+            'Runs on a throwaway test database and a private cache.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--services', type=int, default=300)
+        parser.add_argument('--staff', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per URL.')
+
+    def handle(self, *args, **options):
+        with throwaway_environment():
+            self.seed(options)
+            with override_settings(DEBUG=False, CACHES=DUMMY_CACHE):
+                uncached = self.measure(options['requests'])
+            cache.clear()
+            with override_settings(DEBUG=False):
+                cached = self.measure(options['requests'])
+            stats = catalog_stats()
+        self.stdout.write(json.dumps({'uncached': uncached, 'cached': cached, 'cache_stats': stats}, indent=2))
+
+    def seed(self, options):
+        categories = Category_service.objects.bulk_create(
+            Category_service(name=f'Bench category {i}') for i in range(options['categories'])
+        )
+        services = Services.objects.bulk_create(
+            Services(name=f'Bench service {i}', price=100, duration=60) for i in range(options['services'])
+        )
+        Services.category.through.objects.bulk_create(
+            Services.category.through(services_id=service.pk, category_service_id=categories[i % len(categories)].pk)
+            for i, service in enumerate(services)
+        )
+        Staff.objects.bulk_create(
+            Staff(first_name='Bench', last_name=str(i), phone='123456789', position=1)
+            for i in range(options['staff'])
+        )
+
+    def measure(self, requests):
+        client = Client()
+        results = {}
+        for url in URLS:
+            began = timer.perf_counter()
+            for _ in range(requests):
+                client.get(url)
+            elapsed = timer.perf_counter() - began
+            results[url] = {'requests_per_second': round(requests / elapsed, 1)}
+        return results
@@ -0,0 +1,78 @@
+import json
+import logging
+import statistics
+import time as timer
+from wsgiref.util import setup_testing_defaults
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from beauty_for_you_app.checks import describe_connection
+
+from .benchmark import percentile
+
+MODES = {
+    'new_connection_per_request': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+    'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': False},
+    'persistent_with_health_checks': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+}
+
+
+class Command(BaseCommand):
+    help = ('Measures per-request latency of a page with a new database connection per request and with '
+            'persistent connections, against the configured default database, e.g. a local Postgres. '
+            'Requests go through the WSGI handler: under ASGI persistent connections are not reused.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/staff/', help='Page to request; it should only read.')
+        parser.add_argument('--requests', type=int, default=300)
+
+    def handle(self, *args, **options):
+        logging.getLogger('beauty_for_you_app.queries').setLevel(logging.ERROR)
+        # The WSGI handler sends request_started and request_finished, which close connections by
+        # CONN_MAX_AGE exactly as in production; the test client skips that.
+        handler = WSGIHandler()
+        original = {name: connection.settings_dict[name] for name in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+        report = {'database': describe_connection(connection.alias), 'path': options['path']}
+        try:
+            for mode, values in MODES.items():
+                connection.close()
+                connection.settings_dict.update(values)
+                self.request(handler, options['path'])
+                report[mode] = self.measure(handler, options['path'], options['requests'])
+        finally:
+            connection.close()
+            connection.settings_dict.update(original)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def request(self, handler, path):
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET'}
+        setup_testing_defaults(environ)
+        response = handler(environ, lambda status, headers: None)
+        b''.join(response)
+        response.close()
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} answered {response.status_code}')
+
+    def measure(self, handler, path, requests):
+        connects = []
+
+        def count_connect(sender, connection, **kwargs):
+            connects.append(connection.alias)
+
+        timings = []
+        connection_created.connect(count_connect)
+        try:
+            for _ in range(requests):
+                began = timer.perf_counter()
+                self.request(handler, path)
+                timings.append((timer.perf_counter() - began) * 1000)
+        finally:
+            connection_created.disconnect(count_connect)
+        return {
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'connections_opened': len(connects),
+        }
@@ -0,0 +1,110 @@
+import json
+import logging
+import statistics
+import threading
+import time as timer
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from beauty_for_you_app.availability import ALL_TIMES, working_days
+from beauty_for_you_app.models import Category_service, Services, Staff
+
+from .benchmark import percentile, throwaway_environment
+
+UNTHROTTLED = {'login_ip': None, 'login_username': None}
+BOOKED = 'Rezerwacja została przyjęta'.encode()
+
+
+class Command(BaseCommand):
+    help = ('Measures booking latency alone and while threads flood the login view with wrong passwords, '
+            'with and without throttling. Runs on a throwaway test database and a private cache, which holds '
+            'the throttle buckets.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=50)
+        parser.add_argument('--flood-threads', type=int, default=8)
+        parser.add_argument('--flood-rate', type=float, default=50, help='Login attempts per second the flood sends.')
+        parser.add_argument('--addresses', type=int, default=2, help='Client addresses the flood comes from.')
+        parser.add_argument('--warmup', type=float, default=20,
+                            help='Seconds the flood runs before bookings start, long enough to empty the buckets.')
+
+    def handle(self, *args, **options):
+        logging.getLogger('beauty_for_you_app.queries').setLevel(logging.ERROR)
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        report = {}
+        with throwaway_environment():
+            client, url, slots = self.seed(options)
+            report['no_flood'] = self.measure(client, url, slots, options, flood_threads=0)
+            with override_settings(THROTTLE_RATES=UNTHROTTLED):
+                report['flood_unthrottled'] = self.measure(client, url, slots, options)
+            report['flood_throttled'] = self.measure(client, url, slots, options)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def seed(self, options):
+        user = User.objects.create_user(username='bench_login_flood', password='bench-password')
+        staff = Staff.objects.create(first_name='Bench', last_name='Flood', phone='123456789', position=1)
+        service = Services.objects.create(name='Bench 60', price=100, duration=60)
+        category_service = Category_service.objects.create(name='Bench flood')
+        service.category.add(category_service)
+        staff.categories.add(category_service)
+        client = Client()
+        client.force_login(user)
+        days = working_days(date.today() + timedelta(days=1), date.today() + timedelta(days=3650))
+        slots = ({'staff': staff.pk, 'service': service.pk, 'date': day.isoformat(), 'time': slot}
+                 for day in days for slot in ALL_TIMES)
+        return client, reverse('reservation', args=[category_service.pk]), slots
+
+    def flood(self, address, interval, stop, attempts):
+        # Every thread has its own connection to the benchmark database.
+        flooder = Client(REMOTE_ADDR=address)
+        try:
+            while not stop.is_set():
+                began = timer.perf_counter()
+                response = flooder.post(reverse('login'), {'login': f'victim{len(attempts)}', 'password': 'guess'})
+                attempts.append(response.status_code)
+                stop.wait(interval - (timer.perf_counter() - began))
+        finally:
+            connection.close()
+
+    def measure(self, client, url, slots, options, flood_threads=None):
+        cache.clear()
+        flood_threads = options['flood_threads'] if flood_threads is None else flood_threads
+        stop = threading.Event()
+        attempts = []
+        interval = flood_threads / options['flood_rate'] if flood_threads else 0
+        threads = [
+            threading.Thread(target=self.flood,
+                             args=(f'10.0.0.{number % options["addresses"] + 1}', interval, stop, attempts))
+            for number in range(flood_threads)
+        ]
+        for thread in threads:
+            thread.start()
+        if threads:
+            timer.sleep(options['warmup'])
+        del attempts[:]
+        timings = []
+        began = timer.perf_counter()
+        try:
+            for _ in range(options['bookings']):
+                started = timer.perf_counter()
+                response = client.post(url, next(slots))
+                timings.append((timer.perf_counter() - started) * 1000)
+                if BOOKED not in response.content:
+                    raise RuntimeError(f'Booking failed with status {response.status_code}')
+        finally:
+            elapsed = timer.perf_counter() - began
+            stop.set()
+            for thread in threads:
+                thread.join()
+        return {
+            'booking_p50_ms': round(statistics.median(timings), 3),
+            'booking_p95_ms': round(percentile(timings, 95), 3),
+            'login_attempts_per_second': round(len(attempts) / elapsed, 1),
+            'login_attempts_throttled': attempts.count(429),
+        }
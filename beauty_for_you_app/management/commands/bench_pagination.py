@@ -0,0 +1,59 @@
+import json
+import statistics
+import time as timer
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from beauty_for_you_app.models import Product
+from beauty_for_you_app.pagination import KeysetPaginator
+
+
+class Command(BaseCommand):
+    help = ('Compares OFFSET and keyset pagination latency of the shop on the first and a deep page. '
+            'All generated data is rolled back at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=5000, help='Deep page number to measure.')
+        parser.add_argument('--per-page', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            results = self.run(options)
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, options):
+        per_page, deep = options['per_page'], options['page']
+        total = per_page * deep
+        for start in range(0, total, options['batch_size']):
+            Product.objects.bulk_create(
+                Product(name=f'Bench product {i}', description='bench', price=i % 500)
+                for i in range(start, min(start + options['batch_size'], total))
+            )
+
+        queryset = Product.objects.for_listing()
+        offset = Paginator(queryset.order_by('price', 'id'), per_page)
+        keyset = KeysetPaginator(queryset, ('price', 'id'), per_page)
+        # The cursor a visitor would hold after clicking "next" deep - 1 times.
+        anchor = queryset.order_by('price', 'id')[(deep - 1) * per_page - 1]
+        deep_cursor = keyset.encode_cursor(anchor)
+
+        return {
+            'products': total,
+            'offset_page_1_ms': self.measure(lambda: list(offset.get_page(1)), options['repeat']),
+            f'offset_page_{deep}_ms': self.measure(lambda: list(offset.get_page(deep)), options['repeat']),
+            'keyset_page_1_ms': self.measure(lambda: list(keyset.get_page()), options['repeat']),
+            f'keyset_page_{deep}_ms': self.measure(lambda: list(keyset.get_page(deep_cursor)), options['repeat']),
+        }
+
+    def measure(self, fetch, repeat):
+        timings = []
+        for _ in range(repeat):
+            began = timer.perf_counter()
+            fetch()
+            timings.append((timer.perf_counter() - began) * 1000)
+        return round(statistics.median(timings), 3)
@@ -0,0 +1,88 @@
+import json
+import random
+import statistics
+import time as timer
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from beauty_for_you_app.models import Category, Product
+from beauty_for_you_app.search import match_products, product_facets, search_terms, shop_facets
+
+from .benchmark import percentile, throwaway_environment
+
+WORDS = ('szampon', 'odżywka', 'krem', 'serum', 'maska', 'balsam', 'olejek', 'tonik', 'peeling', 'żel',
+         'nawilżający', 'odżywczy', 'ziołowy', 'różany', 'arganowy', 'kokosowy', 'matujący', 'regenerujący',
+         'włosy', 'twarz', 'ciało', 'dłonie', 'stopy', 'oczy', 'usta', 'skóra', 'sucha', 'tłusta', 'wrażliwa')
+BRANDS = 2000
+# Common words, where a LIKE scan finds a page quickly, then selective ones, where it reads the whole table.
+QUERIES = ('szampon', 'krem nawil', 'regenerujący balsam ciało', 'marka1234', 'marka77 serum', 'serum do twarzy')
+
+
+def icontains_products(queryset, query):
+    for term in search_terms(query):
+        queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+    return queryset
+
+
+class Command(BaseCommand):
+    help = ('Compares the full-text product search with a plain LIKE search, for the first result page and '
+            'for the facet counts, and the unfiltered shop facets counted live and from the cache. Runs on a '
+            'throwaway test database and a private cache.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        with throwaway_environment():
+            results = self.run(options)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        categories = Category.objects.bulk_create(
+            Category(category_name=f'Bench category {i}') for i in range(options['categories'])
+        )
+        total = options['products']
+        for start in range(0, total, options['batch_size']):
+            products = Product.objects.bulk_create(
+                Product(name=' '.join(rng.sample(WORDS, 3) + [f'Marka{rng.randrange(BRANDS)}']),
+                        description=' '.join(rng.choices(WORDS, k=12)),
+                        price=rng.randint(1, 300))
+                for _ in range(start, min(start + options['batch_size'], total))
+            )
+            Product.categories.through.objects.bulk_create(
+                Product.categories.through(product_id=product.pk, category_id=rng.choice(categories).pk)
+                for product in products
+            )
+        return categories
+
+    def run(self, options):
+        categories = self.seed(options)
+        queryset = Product.objects.for_listing().order_by('price', 'id')
+        results = {'products': options['products'], 'vendor': connection.vendor}
+        results['unfiltered_facets'] = {'live_ms': self.measure(lambda: product_facets(categories), options)}
+        # Fills the cache, the shop pages then read the facets from it until the catalog changes.
+        shop_facets(categories)
+        results['unfiltered_facets']['cached_ms'] = self.measure(lambda: shop_facets(categories), options)
+        for query in QUERIES:
+            results[query] = {
+                'matches': match_products(Product.objects.all(), query).count(),
+                'full_text_page_ms': self.measure(lambda: list(match_products(queryset, query)[:10]), options),
+                'like_page_ms': self.measure(lambda: list(icontains_products(queryset, query)[:10]), options),
+                'facets_ms': self.measure(lambda: product_facets(categories, query), options),
+            }
+        return results
+
+    def measure(self, fetch, options):
+        timings = []
+        for _ in range(options['repeat']):
+            began = timer.perf_counter()
+            fetch()
+            timings.append((timer.perf_counter() - began) * 1000)
+        return {'p50': round(statistics.median(timings), 3), 'p95': round(percentile(timings, 95), 3)}
@@ -0,0 +1,69 @@
+import json
+import logging
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from beauty_for_you_app.auth import user_cache_key
+
+DJANGO_AUTH = 'django.contrib.auth.middleware.AuthenticationMiddleware'
+CACHED_AUTH = 'beauty_for_you_app.middleware.CachedAuthenticationMiddleware'
+CONFIGURATIONS = {
+    'db_sessions': ('db', DJANGO_AUTH),
+    'cached_db_sessions': ('cached_db', DJANGO_AUTH),
+    'cached_db_sessions_and_user': ('cached_db', CACHED_AUTH),
+    'signed_cookie_sessions_and_cached_user': ('signed_cookies', CACHED_AUTH),
+}
+
+
+def middleware(auth_middleware):
+    return [auth_middleware if name in (DJANGO_AUTH, CACHED_AUTH) else name for name in settings.MIDDLEWARE]
+
+
+class Command(BaseCommand):
+    help = ('Counts the session and auth_user queries per anonymous and authenticated request with each '
+            'session store and with or without the cached user. The test user is rolled back at the end.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/staff/')
+        parser.add_argument('--requests', type=int, default=20)
+
+    def handle(self, *args, **options):
+        logging.getLogger('beauty_for_you_app.queries').setLevel(logging.ERROR)
+        report = {}
+        with transaction.atomic():
+            user = User.objects.create_user(username='bench_sessions', password='bench-password')
+            for name, (store, auth_middleware) in CONFIGURATIONS.items():
+                engine = f'django.contrib.sessions.backends.{store}'
+                # Single process, so the process-local cache is as good as a shared one here.
+                with override_settings(SESSION_ENGINE=engine, MIDDLEWARE=middleware(auth_middleware),
+                                       AUTH_USER_CACHE_TIMEOUT=60 * 5):
+                    report[name] = {
+                        'anonymous': self.measure(Client(), options),
+                        'authenticated': self.measure(self.logged_in(user), options),
+                    }
+            cache.delete(user_cache_key(user.pk))
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def logged_in(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def measure(self, client, options):
+        client.get(options['path'])
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(options['requests']):
+                client.get(options['path'])
+        sql = [query['sql'] for query in queries.captured_queries]
+        return {
+            'queries_per_request': len(sql) / options['requests'],
+            'session_queries_per_request': sum('django_session' in query for query in sql) / options['requests'],
+            'user_queries_per_request': sum('auth_user' in query for query in sql) / options['requests'],
+        }
@@ -0,0 +1,83 @@
+import json
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+ASSET_REFERENCE = re.compile(r'(?:href|src)="([^"]+)"')
+MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+def transferred(response):
+    """
+    Returns the approximate number of bytes of a response on the wire: status line, headers and body.
+    """
+    body = b''.join(response.streaming_content) if response.streaming else response.content
+    headers = sum(len(name) + len(value) + 4 for name, value in response.items())
+    return len(f'HTTP/1.1 {response.status_code} {response.reason_phrase}\r\n') + headers + 2 + len(body)
+
+
+class Command(BaseCommand):
+    help = ('Measures the bytes transferred for a cold and a warm load of a page and its static assets, '
+            'without and with compression. Run collectstatic first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help='Page to load; "/" renders main.html.')
+
+    def handle(self, *args, **options):
+        if hasattr(staticfiles_storage, 'load_manifest') and not staticfiles_storage.load_manifest():
+            raise CommandError('No staticfiles manifest found; run collectstatic first.')
+        report = {}
+        # Hashed names and far-future caching are only used outside of DEBUG.
+        with override_settings(DEBUG=False):
+            for label, encoding in (('identity', ''), ('compressed', 'br, gzip')):
+                client = Client(HTTP_ACCEPT_ENCODING=encoding)
+                cold, cache = self.cold_load(client, options['path'])
+                report[f'cold_{label}'] = cold
+                report[f'warm_{label}'] = self.warm_load(client, options['path'], cache)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def cold_load(self, client, path):
+        """
+        Loads the page and every static asset it references, like a browser with an empty cache.
+        """
+        page = client.get(path)
+        if page.status_code != 200:
+            raise CommandError(f'{path} answered {page.status_code}')
+        html = page.content.decode()
+        resources = [{'url': path, 'bytes': transferred(page)}]
+        cache = {}
+        for url in dict.fromkeys(ASSET_REFERENCE.findall(html)):
+            if not url.startswith(settings.STATIC_URL):
+                continue
+            response = client.get(url)
+            resources.append({
+                'url': url,
+                'status': response.status_code,
+                'encoding': response.get('Content-Encoding', 'identity'),
+                'cache_control': response.get('Cache-Control'),
+                'bytes': transferred(response),
+            })
+            cache[url] = response
+        return {'bytes': sum(resource['bytes'] for resource in resources), 'resources': resources}, cache
+
+    def warm_load(self, client, path, cache):
+        """
+        Loads the page again: fresh assets come from the browser cache, stale ones are revalidated.
+        """
+        resources = [{'url': path, 'bytes': transferred(client.get(path))}]
+        for url, cached in cache.items():
+            max_age = MAX_AGE.search(cached.get('Cache-Control', ''))
+            if max_age and int(max_age.group(1)) > 0:
+                resources.append({'url': url, 'status': 'from cache', 'bytes': 0})
+                continue
+            headers = {}
+            if cached.has_header('ETag'):
+                headers['HTTP_IF_NONE_MATCH'] = cached['ETag']
+            if cached.has_header('Last-Modified'):
+                headers['HTTP_IF_MODIFIED_SINCE'] = cached['Last-Modified']
+            response = client.get(url, **headers)
+            resources.append({'url': url, 'status': response.status_code, 'bytes': transferred(response)})
+        return {'bytes': sum(resource['bytes'] for resource in resources), 'resources': resources}
@@ -0,0 +1,101 @@
+import copy
+import json
+import time as timer
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+
+from beauty_for_you_app.models import Category, Category_service, Product, Services, Staff
+from beauty_for_you_app.pagination import KeysetPaginator
+
+from .bench_catalog_cache import DUMMY_CACHE
+from .benchmark import throwaway_environment
+
+
+def templates_setting(cached_loader):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    loaders = settings.TEMPLATE_LOADERS
+    templates[0]['OPTIONS']['loaders'] = [('django.template.loaders.cached.Loader', loaders)] if cached_loader \
+        else loaders
+    return templates
+
+
+class Command(BaseCommand):
+    help = ('Measures render time of the catalog and shop templates with the plain loader, the cached '
+            'loader, and the cached loader with fragment caching, for anonymous and staff users. '
+            'Runs on a throwaway test database and a private cache.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--services', type=int, default=300)
+        parser.add_argument('--staff', type=int, default=50)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--renders', type=int, default=200, help='Renders per template and user.')
+
+    def handle(self, *args, **options):
+        with throwaway_environment():
+            self.seed(options)
+            pages = self.pages()
+            report = {}
+            with override_settings(DEBUG=False, CACHES=DUMMY_CACHE):
+                with override_settings(TEMPLATES=templates_setting(False)):
+                    report['plain_loader'] = self.measure(pages, options['renders'])
+                with override_settings(TEMPLATES=templates_setting(True)):
+                    report['cached_loader'] = self.measure(pages, options['renders'])
+            cache.clear()
+            with override_settings(DEBUG=False, TEMPLATES=templates_setting(True)):
+                report['cached_loader_and_fragments'] = self.measure(pages, options['renders'])
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def seed(self, options):
+        categories = Category_service.objects.bulk_create(
+            Category_service(name=f'Bench category {i}') for i in range(options['categories'])
+        )
+        services = Services.objects.bulk_create(
+            Services(name=f'Bench service {i}', price=100, duration=60) for i in range(options['services'])
+        )
+        Services.category.through.objects.bulk_create(
+            Services.category.through(services_id=service.pk, category_service_id=categories[i % len(categories)].pk)
+            for i, service in enumerate(services)
+        )
+        Staff.objects.bulk_create(
+            Staff(first_name='Bench', last_name=str(i), phone='123456789', position=1, description='Opis')
+            for i in range(options['staff'])
+        )
+        shop_category = Category.objects.create(category_name='Bench')
+        products = Product.objects.bulk_create(
+            Product(name=f'Bench product {i}', description='Opis', price=i + 1) for i in range(options['products'])
+        )
+        Product.categories.through.objects.bulk_create(
+            Product.categories.through(product_id=product.pk, category_id=shop_category.pk) for product in products
+        )
+
+    def pages(self):
+        """
+        Returns (template, context) pairs with their querysets already evaluated, so only rendering is timed.
+        """
+        return [
+            ('main.html', {'category_service': list(Category_service.objects.all())}),
+            ('staff.html', {'staff': list(Staff.objects.all())}),
+            ('service.html', {'service': list(Services.objects.for_listing())}),
+            ('shop.html', {'shop': KeysetPaginator(Product.objects.for_listing(), ('price', 'id'), 10).get_page()}),
+        ]
+
+    def measure(self, pages, renders):
+        factory = RequestFactory()
+        users = {'anonymous': AnonymousUser(), 'staff': User(username='bench', is_staff=True)}
+        results = {}
+        for template, context in pages:
+            for kind, user in users.items():
+                request = factory.get('/')
+                request.user = user
+                began = timer.perf_counter()
+                for _ in range(renders):
+                    render_to_string(template, context, request)
+                elapsed = timer.perf_counter() - began
+                results[f'{template} ({kind})'] = {'ms_per_render': round(elapsed / renders * 1000, 3)}
+        return results
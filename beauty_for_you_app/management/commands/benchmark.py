@@ -0,0 +1,146 @@
+import json
+import logging
+import re
+import statistics
+import time as timer
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client, override_settings
+
+from beauty_for_you_app.models import Category_service, Staff
+from beauty_for_you_app.seeding import Seeder
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+PRIVATE_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}}
+
+
+@contextmanager
+def throwaway_environment(keepdb=False):
+    """
+    Points the default database at a throwaway test database and the default cache at a private
+    LocMemCache for the block, so a benchmark neither writes to the configured database nor
+    clears a shared cache holding sessions and throttle buckets.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb)
+    try:
+        with override_settings(CACHES=PRIVATE_CACHE):
+            yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway test database with realistic data and drives the main pages with '
+            'concurrent in-process clients. Prints latency percentiles, queries per request and '
+            'requests per second as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--staff', type=int, default=40)
+        parser.add_argument('--categories', type=int, default=8)
+        parser.add_argument('--services', type=int, default=120)
+        parser.add_argument('--products', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--reservations', type=int, default=100000)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Number of concurrent clients.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--label', default='', help='Free text stored in the report, e.g. a commit hash.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep (and reuse) the benchmark database.')
+
+    def handle(self, *args, **options):
+        # Contention between the client threads makes every query look slow; keep the report readable.
+        logging.getLogger('beauty_for_you_app.queries').setLevel(logging.ERROR)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'])
+        try:
+            with override_settings(DEBUG=False):
+                if not Staff.objects.exists():
+                    self.seed(options)
+                report = self.run(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def seed(self, options):
+        Seeder(seed=options['seed']).seed(
+            staff=options['staff'],
+            categories=options['categories'],
+            services=options['services'],
+            users=options['users'],
+            products=options['products'],
+            reservations=options['reservations'],
+        )
+
+    def run(self, options):
+        category = Category_service.objects.order_by('pk').first()
+        endpoints = ['/', '/service/', '/shop/', f'/reservation/{category.pk}/', '/my_reservation/']
+        users = list(User.objects.order_by('pk')[:options['concurrency']])
+        clients = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+
+        results = {}
+        for url in endpoints:
+            results[url] = self.drive(url, clients, options['requests'])
+        return {
+            'label': options['label'],
+            'concurrency': options['concurrency'],
+            'data': {name: options[name] for name in ('staff', 'services', 'products', 'users', 'reservations')},
+            'endpoints': results,
+        }
+
+    def drive(self, url, clients, requests):
+        def worker(client, count):
+            samples = []
+            try:
+                for _ in range(count):
+                    began = timer.perf_counter()
+                    response = client.get(url)
+                    elapsed = (timer.perf_counter() - began) * 1000
+                    match = SERVER_TIMING_QUERIES.search(response.get('Server-Timing', ''))
+                    samples.append((elapsed, int(match.group(1)) if match else None, response.status_code))
+            finally:
+                connections.close_all()
+            return samples
+
+        share, extra = divmod(requests, len(clients))
+        began = timer.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+            futures = [executor.submit(worker, client, share + (1 if i < extra else 0))
+                       for i, client in enumerate(clients)]
+            samples = [sample for future in futures for sample in future.result()]
+        wall = timer.perf_counter() - began
+
+        latencies = [sample[0] for sample in samples]
+        queries = [sample[1] for sample in samples if sample[1] is not None]
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for sample in samples if sample[2] >= 400),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'queries_per_request': round(statistics.mean(queries), 2) if queries else None,
+            'requests_per_second': round(len(samples) / wall, 1),
+        }
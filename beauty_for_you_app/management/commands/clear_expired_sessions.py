@@ -0,0 +1,31 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DatabaseSessionStore
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Deletes expired sessions from the database in batches, so the sessions table is never locked by '
+            'one large DELETE as with clearsessions. Sessions kept only in the cache or in signed cookies '
+            'expire on their own.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not issubclass(store, DatabaseSessionStore):
+            self.stdout.write(f'{settings.SESSION_ENGINE} does not keep sessions in the database.')
+            return
+        model = store.get_model_class()
+        now = timezone.now()
+        total = 0
+        while True:
+            batch = list(model.objects.filter(expire_date__lt=now).values_list('pk', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            deleted, _ = model.objects.filter(pk__in=batch).delete()
+            total += deleted
+        self.stdout.write(f'Deleted {total} expired sessions.')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from beauty_for_you_app.schedule import REFRESH_BATCH, rebuild_schedule
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the StaffDaySchedule table from all reservations. Use it after bulk '
+            'imports or raw SQL changes that bypass the model signals.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REFRESH_BATCH)
+
+    def handle(self, *args, **options):
+        rows = rebuild_schedule(options['batch_size'])
+        self.stdout.write(f'Rebuilt {rows} staff schedule days.')
@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from beauty_for_you_app.seeding import SEED_PASSWORD, Seeder
+
+
+class Command(BaseCommand):
+    help = ('Fills the database with synthetic staff, categories, services, users, products and '
+            'reservations using chunked bulk inserts. The same --seed and --anchor-date give the same data; '
+            'users of an earlier run are reused.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--staff', type=int, default=40)
+        parser.add_argument('--categories', type=int, default=8)
+        parser.add_argument('--services', type=int, default=120)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--shop-categories', type=int, default=10)
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--reservations', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--anchor-date', type=date.fromisoformat, default=None,
+                            help='YYYY-MM-DD date the reservations are spread around; today by default.')
+
+    def handle(self, *args, **options):
+        log = (lambda message: self.stderr.write(message)) if options['verbosity'] > 1 else None
+        seeder = Seeder(seed=options['seed'], batch_size=options['batch_size'], log=log, anchor=options['anchor_date'])
+        seeder.seed(
+            staff=options['staff'],
+            categories=options['categories'],
+            services=options['services'],
+            users=options['users'],
+            shop_categories=options['shop_categories'],
+            products=options['products'],
+            reservations=options['reservations'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {options["reservations"]} reservations. Seeded users log in with password "{SEED_PASSWORD}".'
+        ))
@@ -0,0 +1,204 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from .auth import get_cached_user
+from .routers import PIN_COOKIE, RequestRouting, activate_routing, deactivate_routing
+
+logger = logging.getLogger('beauty_for_you_app.queries')
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised when a view runs more SQL queries than allowed in settings.QUERY_BUDGETS.
+    """
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper collecting the SQL and execution time of every query.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for sql, duration in self.queries)
+
+    def duplicates(self):
+        """
+        Returns {sql: count} for statements run more than once - the signature of an N+1 loop.
+        """
+        counter = Counter(sql for sql, duration in self.queries)
+        return {sql: count for sql, count in counter.items() if count > 1}
+
+    def slow(self, threshold_ms):
+        return [(sql, duration) for sql, duration in self.queries if duration * 1000 >= threshold_ms]
+
+
+def query_budget(url_name, method):
+    """
+    Returns the budget of a request from settings.QUERY_BUDGETS, where a URL name maps to one
+    budget for every method or to a dict of budgets by HTTP method.
+    """
+    budget = getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+    if isinstance(budget, dict):
+        return budget.get(method)
+    return budget
+
+
+class QueryCountMiddleware:
+    """
+    Middleware counting SQL queries and database time of every request, under WSGI and ASGI.
+
+    Adds a `Server-Timing` header, logs one JSON line per request on the
+    'beauty_for_you_app.queries' logger and checks the per-URL-name and method budget
+    from settings.QUERY_BUDGETS. With settings.QUERY_BUDGET_RAISE enabled an
+    exceeded budget raises QueryBudgetExceeded instead of logging a warning.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        return self.process(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        # Under ASGI the ORM runs queries in sync_to_async threads that share this
+        # context's connection objects, so the wrappers installed here still see them.
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = await self.get_response(request)
+        return self.process(request, response, recorder, time.perf_counter() - start)
+
+    def process(self, request, response, recorder, total):
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        duplicates = recorder.duplicates()
+        slow = recorder.slow(getattr(settings, 'SLOW_QUERY_MS', 100))
+        budget = query_budget(url_name, request.method)
+        over_budget = budget is not None and recorder.count > budget
+
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries", '
+            f'total;dur={total * 1000:.2f}'
+        )
+
+        entry = {
+            'event': 'request_queries',
+            'method': request.method,
+            'path': request.path,
+            'url_name': url_name,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'duplicates': sum(count - 1 for count in duplicates.values()),
+            'budget': budget,
+        }
+        if duplicates:
+            entry['duplicate_sql'] = [sql[:200] for sql in duplicates]
+        if slow:
+            entry['slow_sql'] = [{'sql': sql[:200], 'ms': round(duration * 1000, 2)} for sql, duration in slow]
+        level = logging.WARNING if duplicates or slow or over_budget else logging.INFO
+        logger.log(level, json.dumps(entry))
+
+        if over_budget and getattr(settings, 'QUERY_BUDGET_RAISE', False):
+            raise QueryBudgetExceeded(
+                f'{url_name} ran {recorder.count} queries, budget is {budget}: '
+                + '; '.join(sql for sql, duration in recorder.queries)
+            )
+        return response
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Middleware giving PrimaryReplicaRouter the routing state of the current request.
+
+    A request that wrote to the database sets a cookie pinning the user's reads to the primary
+    for settings.REPLICA_PIN_SECONDS, so they see their own booking despite replication lag.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        routing = self.start(request)
+        token = activate_routing(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            deactivate_routing(token)
+        return self.process(routing, response)
+
+    async def __acall__(self, request):
+        # sync_to_async copies the context, so views run in threads see the routing state.
+        routing = self.start(request)
+        token = activate_routing(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            deactivate_routing(token)
+        return self.process(routing, response)
+
+    def start(self, request):
+        request.database_routing = RequestRouting(pinned=PIN_COOKIE in request.COOKIES)
+        return request.database_routing
+
+    def process(self, routing, response):
+        if routing.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware taking request.user from the cache instead of an auth_user query.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
@@ -0,0 +1,82 @@
+# Generated by Django 4.2.3 on 2026-10-18 10:53
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def release_double_bookings(apps, schema_editor):
+    """
+    Before the unique constraint, keep the oldest reservation of every taken (staff, date, time)
+    slot and clear the time of the others, so they show up as reservations without a time.
+    """
+    Reservation = apps.get_model('beauty_for_you_app', 'Reservation')
+    earlier = Reservation.objects.filter(staff=OuterRef('staff'), date=OuterRef('date'), time=OuterRef('time'),
+                                         id__lt=OuterRef('id'))
+    released = list(Reservation.objects.filter(Exists(earlier), time__isnull=False).values_list('id', flat=True))
+    if released:
+        print(f'\n  Cleared the time of double booked reservations {released}', end='')
+        Reservation.objects.filter(id__in=released).update(time=None)
+
+
+class AddIndexConcurrentlyOnPostgres(AddIndexConcurrently):
+    """
+    AddIndexConcurrently on Postgres, so reservations can still be written while the index
+    is built; a plain AddIndex on the other databases.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class AddConstraintConcurrentlyOnPostgres(migrations.AddConstraint):
+    """
+    AddConstraint for a conditional UniqueConstraint, which Postgres creates as a partial unique
+    index; built with CREATE UNIQUE INDEX CONCURRENTLY there for the same reason.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        statement = self.constraint.create_sql(model, schema_editor)
+        statement.template = statement.template.replace('CREATE UNIQUE INDEX', 'CREATE UNIQUE INDEX CONCURRENTLY', 1)
+        schema_editor.execute(statement)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        schema_editor.execute(schema_editor.sql_delete_index_concurrently % {
+            'name': schema_editor.quote_name(self.constraint.name),
+        })
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('beauty_for_you_app', '0003_remove_category_service_employee_category_staff'),
+    ]
+
+    operations = [
+        migrations.RunPython(release_double_bookings, migrations.RunPython.noop, atomic=True),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='reservation',
+            index=models.Index(fields=['client', 'date'], name='reservation_client_date_idx'),
+        ),
+        # Also serves the (staff, date, time) slot lookups, which all exclude reservations without a time.
+        AddConstraintConcurrentlyOnPostgres(
+            model_name='reservation',
+            constraint=models.UniqueConstraint(condition=models.Q(('time__isnull', False)), fields=('staff', 'date', 'time'), name='reservation_unique_staff_slot'),
+        ),
+    ]
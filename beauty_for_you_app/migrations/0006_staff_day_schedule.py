@@ -0,0 +1,63 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+# Copies of the availability module as of this migration, so later changes there cannot alter it.
+OPENING_HOUR = 7
+CLOSING_HOUR = 16
+SLOT_MINUTES = 60
+
+
+def slot_mask(start, duration):
+    first = start.hour - OPENING_HOUR
+    if not 0 <= first < CLOSING_HOUR - OPENING_HOUR:
+        return 0
+    needed = max(1, -(-(duration or SLOT_MINUTES) // SLOT_MINUTES))
+    last = min(first + needed, CLOSING_HOUR - OPENING_HOUR)
+    return (1 << last) - (1 << first)
+
+
+def fill_schedule(apps, schema_editor):
+    Reservation = apps.get_model('beauty_for_you_app', 'Reservation')
+    StaffDaySchedule = apps.get_model('beauty_for_you_app', 'StaffDaySchedule')
+    rows = (
+        Reservation.objects
+        .filter(time__isnull=False)
+        .annotate(total_duration=Sum('service__duration'))
+        .values_list('staff_id', 'date', 'time', 'total_duration')
+        .order_by()
+    )
+    masks = {}
+    for staff_id, day, start, duration in rows.iterator(chunk_size=2000):
+        masks[staff_id, day] = masks.get((staff_id, day), 0) | slot_mask(start, duration)
+    StaffDaySchedule.objects.bulk_create(
+        (StaffDaySchedule(staff_id=staff_id, date=day, occupied=occupied)
+         for (staff_id, day), occupied in masks.items() if occupied),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('beauty_for_you_app', '0005_product_price_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffDaySchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('occupied', models.PositiveIntegerField(default=0)),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='beauty_for_you_app.staff')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='staffdayschedule',
+            constraint=models.UniqueConstraint(fields=('staff', 'date'), name='staff_day_schedule_unique'),
+        ),
+        migrations.RunPython(fill_schedule, migrations.RunPython.noop),
+    ]
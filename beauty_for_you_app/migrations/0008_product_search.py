@@ -0,0 +1,56 @@
+from django.db import migrations, OperationalError
+
+PRODUCT = 'beauty_for_you_app_product'
+FTS = 'beauty_for_you_app_product_fts'
+# Must stay identical to search.PRODUCT_DOCUMENT, otherwise Postgres cannot use the index.
+DOCUMENT = "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))"
+
+# On SQLite, migrations that rebuild the product table drop these triggers; run this
+# migration's SQL again after such a change.
+SQLITE_FTS5 = [
+    f"CREATE VIRTUAL TABLE {FTS} USING fts5(name, description, content='{PRODUCT}', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER {FTS}_insert AFTER INSERT ON {PRODUCT} BEGIN "
+    f"INSERT INTO {FTS}(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    f"CREATE TRIGGER {FTS}_delete AFTER DELETE ON {PRODUCT} BEGIN "
+    f"INSERT INTO {FTS}({FTS}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    f"CREATE TRIGGER {FTS}_update AFTER UPDATE OF name, description ON {PRODUCT} BEGIN "
+    f"INSERT INTO {FTS}({FTS}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+    f"INSERT INTO {FTS}(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    f"INSERT INTO {FTS}({FTS}) VALUES ('rebuild')",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'CREATE INDEX product_search_idx ON {PRODUCT} USING gin (({DOCUMENT}))')
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(SQLITE_FTS5[0])
+        except OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE queries.
+            return
+        for statement in SQLITE_FTS5[1:]:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS product_search_idx')
+    elif vendor == 'sqlite':
+        for trigger in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS}_{trigger}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('beauty_for_you_app', '0007_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
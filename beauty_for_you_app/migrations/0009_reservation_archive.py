@@ -0,0 +1,33 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('beauty_for_you_app', '0008_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('staff_name', models.CharField(max_length=76)),
+                ('services', models.JSONField(default=list)),
+                ('category_services', models.JSONField(default=list)),
+                ('date', models.DateField()),
+                ('time', models.TimeField(null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('staff', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='beauty_for_you_app.staff')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['client', 'date', 'id'], name='archive_client_date_idx')],
+            },
+        ),
+    ]
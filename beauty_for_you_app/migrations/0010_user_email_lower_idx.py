@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('beauty_for_you_app', '0009_reservation_archive'),
+    ]
+
+    operations = [
+        # auth_user belongs to django.contrib.auth, so the index is created with SQL; both Postgres and
+        # SQLite support indexes on expressions. Used by auth.users_with_email.
+        migrations.RunSQL(
+            'CREATE INDEX user_email_lower_idx ON auth_user (LOWER(email))',
+            'DROP INDEX user_email_lower_idx',
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.3 on 2026-10-18 12:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 5000
+
+
+def collapse_category_staff(apps, schema_editor):
+    """
+    Copies every distinct (staff, category) pair of the Category_staff rows into StaffCategory.
+    """
+    Category_staff = apps.get_model('beauty_for_you_app', 'Category_staff')
+    StaffCategory = apps.get_model('beauty_for_you_app', 'StaffCategory')
+    pairs = (
+        Category_staff.objects
+        .filter(staff__isnull=False, name__isnull=False)
+        .values_list('staff', 'name').distinct().order_by()
+    )
+    batch = []
+    for staff_id, category_service_id in pairs.iterator(chunk_size=BATCH_SIZE):
+        batch.append(StaffCategory(staff_id=staff_id, category_service_id=category_service_id))
+        if len(batch) == BATCH_SIZE:
+            StaffCategory.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    StaffCategory.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def expand_category_staff(apps, schema_editor):
+    Category_staff = apps.get_model('beauty_for_you_app', 'Category_staff')
+    StaffCategory = apps.get_model('beauty_for_you_app', 'StaffCategory')
+    for link in StaffCategory.objects.iterator(chunk_size=BATCH_SIZE):
+        category_staff = Category_staff.objects.create()
+        category_staff.name.add(link.category_service_id)
+        category_staff.staff.add(link.staff_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('beauty_for_you_app', '0010_user_email_lower_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category_service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='beauty_for_you_app.category_service')),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='beauty_for_you_app.staff')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='categories',
+            field=models.ManyToManyField(through='beauty_for_you_app.StaffCategory', to='beauty_for_you_app.category_service'),
+        ),
+        migrations.AddIndex(
+            model_name='staffcategory',
+            index=models.Index(fields=['category_service', 'staff'], name='staff_category_category_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='staffcategory',
+            constraint=models.UniqueConstraint(fields=('staff', 'category_service'), name='staff_category_unique'),
+        ),
+        migrations.RunPython(collapse_category_staff, expand_category_staff),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 4.2.3 on 2026-10-18 12:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('beauty_for_you_app', '0011_staff_category'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='Category_staff',
+        ),
+    ]
@@ -1,4 +1,7 @@
+from datetime import date, time
+
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator, MinLengthValidator
 
@@ -10,12 +13,42 @@ Position = (
 )
 
 
+class ServicesQuerySet(models.QuerySet):
+    def for_listing(self):
+        return self.prefetch_related('category')
+
+
+class ReservationQuerySet(models.QuerySet):
+    def for_listing(self):
+        return self.select_related('staff').prefetch_related('category_service', 'service')
+
+    def upcoming(self):
+        return self.filter(date__gte=date.today())
+
+    def past(self):
+        return self.filter(date__lt=date.today())
+
+    def with_start_time(self):
+        """
+        Annotates `start_time`, the time with a missing one read as midnight, so reservations can be
+        paginated by ('date', 'start_time', 'id') with KeysetPaginator, which needs non-null values.
+        """
+        return self.annotate(start_time=Coalesce('time', models.Value(time.min), output_field=models.TimeField()))
+
+
+class ProductQuerySet(models.QuerySet):
+    def for_listing(self):
+        return self.prefetch_related('categories')
+
+
 class Staff(models.Model):
     first_name = models.CharField(max_length=25)
     last_name = models.CharField(max_length=50)
     phone = models.CharField(max_length=9, validators=[RegexValidator(r'^\d{1,10}$'), MinLengthValidator(9)])
     position = models.IntegerField(choices=Position)
     description = models.TextField(null=True)
+    categories = models.ManyToManyField('Category_service', through='StaffCategory')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     @property
     def name(self):
@@ -31,17 +64,29 @@ class Staff(models.Model):
 
 class Category_service(models.Model):
     name = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
 
 
-class Category_staff(models.Model):
-    name = models.ManyToManyField(Category_service)
-    staff = models.ManyToManyField(Staff)
+class StaffCategory(models.Model):
+    """
+    Assigns a staff member to a category of services they perform; each pair exists once.
+    """
+    staff = models.ForeignKey(Staff, on_delete=models.CASCADE)
+    category_service = models.ForeignKey(Category_service, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category_service', 'staff'], name='staff_category_category_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['staff', 'category_service'], name='staff_category_unique'),
+        ]
 
     def __str__(self):
-        return self.name
+        return f'{self.staff} - {self.category_service}'
 
 
 class Services(models.Model):
@@ -49,6 +94,9 @@ class Services(models.Model):
     price = models.DecimalField(max_digits=8, decimal_places=2)
     duration = models.IntegerField()
     category = models.ManyToManyField(Category_service)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ServicesQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -62,9 +110,61 @@ class Reservation(models.Model):
     date = models.DateField()
     time = models.TimeField(null=True)
 
+    objects = ReservationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client', 'date'], name='reservation_client_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['staff', 'date', 'time'], condition=models.Q(time__isnull=False),
+                                    name='reservation_unique_staff_slot'),
+        ]
+
+
+class ReservationArchive(models.Model):
+    """
+    A past reservation moved out of Reservation by the archive_reservations command.
+
+    Keeps the id of the reservation, and the staff member and services as text, so the history
+    page reads a single table and the archive survives changes to the catalog.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    client = models.ForeignKey(User, on_delete=models.CASCADE)
+    staff = models.ForeignKey(Staff, on_delete=models.SET_NULL, null=True)
+    staff_name = models.CharField(max_length=76)
+    services = models.JSONField(default=list)
+    category_services = models.JSONField(default=list)
+    date = models.DateField()
+    time = models.TimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client', 'date', 'id'], name='archive_client_date_idx'),
+        ]
+
+
+class StaffDaySchedule(models.Model):
+    """
+    Occupied hours of a staff member on one day, kept in sync with Reservation.
+
+    `occupied` is a bitmap in which bit i stands for the i-th opening hour, so checking
+    a whole day is a single-row read.
+    """
+    staff = models.ForeignKey(Staff, on_delete=models.CASCADE)
+    date = models.DateField()
+    occupied = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['staff', 'date'], name='staff_day_schedule_unique'),
+        ]
+
 
 class Category(models.Model):
     category_name = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.category_name
@@ -75,6 +175,14 @@ class Product(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=8, decimal_places=2)
     categories = models.ManyToManyField(Category)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
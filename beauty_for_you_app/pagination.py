@@ -0,0 +1,133 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """
+    A page of objects returned by KeysetPaginator, with opaque cursors to the neighbouring pages.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, count=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset by seeking past the last row seen instead of using OFFSET.
+
+    `ordering` is a tuple of non-null field or annotation names ending with a unique field (usually 'id'),
+    so every row has a distinct position. Each page costs one indexed range query no matter
+    how deep it is; the total COUNT(*) is only run when `count=True`.
+    """
+
+    def __init__(self, queryset, ordering, per_page, count=False):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.count = count
+
+    def encode_cursor(self, obj, direction='next'):
+        values = [str(getattr(obj, field)) for field in self.ordering]
+        payload = json.dumps([direction, values], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """
+        Returns (direction, values) of a cursor, or None if the cursor is missing or malformed.
+        """
+        if not cursor:
+            return None
+        try:
+            payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(payload)
+            if direction not in ('next', 'previous') or len(values) != len(self.ordering):
+                return None
+            values = [self._field(field).to_python(value) for field, value in zip(self.ordering, values)]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            return None
+        return direction, values
+
+    def _field(self, name):
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def _seek(self, values, lookup):
+        """
+        Builds a >= x AND ((a > x) OR (a = x AND b > y) OR ...) for the ordering fields.
+
+        The redundant leading `a >= x` gives the database a plain range on the first
+        column of the index, which it cannot derive from the OR chain on its own.
+        """
+        condition = Q()
+        for position, field in enumerate(self.ordering):
+            step = Q(**{f'{field}__{lookup}': values[position]})
+            for previous_field, value in zip(self.ordering[:position], values):
+                step &= Q(**{previous_field: value})
+            condition |= step
+        return Q(**{f'{self.ordering[0]}__{lookup}e': values[0]}) & condition
+
+    def _query(self, cursor):
+        decoded = self.decode_cursor(cursor)
+        direction, values = decoded if decoded else ('next', None)
+        backwards = direction == 'previous'
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, 'lt' if backwards else 'gt'))
+        order = [f'-{field}' if backwards else field for field in self.ordering]
+        return queryset.order_by(*order)[:self.per_page + 1], values, backwards
+
+    def _page(self, rows, values, backwards, count):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        has_next = True if backwards else has_more
+        has_previous = has_more if backwards else values is not None
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if rows and has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], 'previous') if rows and has_previous else None,
+            count=count,
+        )
+
+    def get_page(self, cursor=None):
+        """
+        Returns the page pointed to by `cursor`, or the first page if the cursor is missing or invalid.
+        """
+        queryset, values, backwards = self._query(cursor)
+        count = self.queryset.count() if self.count else None
+        return self._page(list(queryset), values, backwards, count)
+
+    async def aget_page(self, cursor=None):
+        queryset, values, backwards = self._query(cursor)
+        count = await self.queryset.acount() if self.count else None
+        return self._page([row async for row in queryset], values, backwards, count)
@@ -0,0 +1,100 @@
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ROUTED_APPS = {'beauty_for_you_app'}
+PIN_COOKIE = 'primary_pin'
+CATALOG_CHANGED_KEY = 'routing:catalog_changed'
+
+_routing = ContextVar('database_routing', default=None)
+
+
+class RequestRouting:
+    """
+    Database routing state of one request, created by DatabaseRoutingMiddleware.
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica_reads = False
+        self.wrote = False
+        self.replica = None
+
+
+def current_routing():
+    return _routing.get()
+
+
+def activate_routing(routing):
+    return _routing.set(routing)
+
+
+def deactivate_routing(token):
+    _routing.reset(token)
+
+
+def pin_catalog_reads():
+    """
+    Sends the catalog reads of every user to the primary for settings.REPLICA_PIN_SECONDS.
+
+    Called when a catalog changes: the new catalog version must not be cached from a lagging replica.
+    """
+    if settings.DATABASE_REPLICAS:
+        cache.set(CATALOG_CHANGED_KEY, True, settings.REPLICA_PIN_SECONDS)
+
+
+def read_from_replica(view_func):
+    """
+    View decorator allowing the reads of the view and its template to go to a replica.
+
+    Has no effect for users pinned to the primary after their own writes, shortly after a
+    catalog change, and without DatabaseRoutingMiddleware.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        routing = current_routing()
+        if routing is not None and settings.DATABASE_REPLICAS and not routing.pinned:
+            routing.replica_reads = not cache.get(CATALOG_CHANGED_KEY)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    """
+    Routes reads of the app's models to one of settings.DATABASE_REPLICAS and writes to the primary.
+
+    Reads use a replica only inside views decorated with read_from_replica and outside of
+    transactions, so bookings check availability on the primary they write to. One replica is
+    picked per request, and once a request writes, its remaining reads stay on the primary.
+    Other apps, e.g. auth and sessions, always use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APPS:
+            return None
+        routing = current_routing()
+        if (routing is None or not routing.replica_reads or routing.wrote
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            # Also for related objects of instances read from a replica.
+            return DEFAULT_DB_ALIAS
+        if routing.replica is None:
+            routing.replica = random.choice(settings.DATABASE_REPLICAS)
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APPS:
+            return None
+        routing = current_routing()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
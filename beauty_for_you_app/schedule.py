@@ -0,0 +1,134 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from .availability import slot_mask
+from .models import Reservation, StaffDaySchedule
+
+REFRESH_BATCH = 500
+
+_pending_days = ContextVar('schedule_pending_days', default=None)
+
+
+def day_masks(reservations):
+    """
+    Yields ((staff_id, date), bitmap) for every reservation in the queryset, with the
+    duration of each reservation being the sum of its services' durations.
+    """
+    rows = (
+        reservations
+        .filter(time__isnull=False)
+        .annotate(total_duration=Sum('service__duration'))
+        .values_list('staff_id', 'date', 'time', 'total_duration')
+        .order_by()
+    )
+    for staff_id, day, start, duration in rows.iterator(chunk_size=2000):
+        yield (staff_id, day), slot_mask(start, duration)
+
+
+def save_schedule(masks, batch_size=REFRESH_BATCH):
+    """
+    Writes {(staff_id, date): bitmap} to StaffDaySchedule, inserting or overwriting the rows.
+    """
+    rows = [StaffDaySchedule(staff_id=staff_id, date=day, occupied=occupied)
+            for (staff_id, day), occupied in masks.items()]
+    StaffDaySchedule.objects.bulk_create(rows, batch_size=batch_size, update_conflicts=True,
+                                         unique_fields=['staff', 'date'], update_fields=['occupied'])
+
+
+def _days_condition(days):
+    condition = Q()
+    for staff_id, day in days:
+        condition |= Q(staff_id=staff_id, date=day)
+    return condition
+
+
+@contextmanager
+def deferred_refresh():
+    """
+    Collects the days refreshed inside the block and refreshes each of them once when it exits,
+    e.g. when a reservation is saved and then gets its services.
+    """
+    if _pending_days.get() is not None:
+        yield
+        return
+    days = set()
+    token = _pending_days.set(days)
+    try:
+        yield
+    finally:
+        _pending_days.reset(token)
+    refresh_schedule(days)
+
+
+def lock_day(staff_id, day):
+    """
+    Locks the schedule row of a staff member's day for the rest of the transaction,
+    creating it first if the day is still empty, and returns its occupied bitmap.
+    """
+    return lock_days([(staff_id, day)])[staff_id, day]
+
+
+def lock_days(days):
+    """
+    Locks the schedule rows of several (staff_id, date) pairs like lock_day, with one insert of the
+    missing rows and one locking query, and returns {(staff_id, date): occupied bitmap}.
+
+    The rows are locked in (staff_id, date) order, so two transactions locking overlapping
+    sets of days wait for each other instead of deadlocking.
+    """
+    days = sorted(set(days))
+    StaffDaySchedule.objects.bulk_create([StaffDaySchedule(staff_id=staff_id, date=day) for staff_id, day in days],
+                                         ignore_conflicts=True)
+    rows = (
+        StaffDaySchedule.objects.select_for_update()
+        .filter(_days_condition(days))
+        .order_by('staff_id', 'date')
+        .values_list('staff_id', 'date', 'occupied')
+    )
+    return {(staff_id, day): occupied for staff_id, day, occupied in rows}
+
+
+def refresh_schedule(days):
+    """
+    Recomputes the schedule of the given (staff_id, date) pairs from their reservations.
+
+    The schedule rows are locked with lock_days before the reservations are read, so a booking
+    committing in the meantime is either waited for or waits for this refresh, and its slots
+    are never overwritten with a bitmap read before it. Costs the lock, one aggregate query
+    over the reservations of those days and one write, however many reservations changed.
+    Days left without reservations lose their row.
+    """
+    pending = _pending_days.get()
+    if pending is not None:
+        pending.update(days)
+        return
+    days = sorted(set(days))
+    for start in range(0, len(days), REFRESH_BATCH):
+        batch = days[start:start + REFRESH_BATCH]
+        with transaction.atomic(savepoint=False):
+            lock_days(batch)
+            masks = dict.fromkeys(batch, 0)
+            for key, mask in day_masks(Reservation.objects.filter(_days_condition(batch))):
+                masks[key] |= mask
+            empty = [key for key, occupied in masks.items() if not occupied]
+            if empty:
+                StaffDaySchedule.objects.filter(_days_condition(empty)).delete()
+            if len(empty) < len(masks):
+                save_schedule({key: occupied for key, occupied in masks.items() if occupied})
+
+
+def rebuild_schedule(batch_size=REFRESH_BATCH):
+    """
+    Recreates the whole schedule from the reservations table and returns the number of rows.
+    """
+    masks = {}
+    for key, mask in day_masks(Reservation.objects.all()):
+        masks[key] = masks.get(key, 0) | mask
+    masks = {key: occupied for key, occupied in masks.items() if occupied}
+    with transaction.atomic():
+        StaffDaySchedule.objects.all().delete()
+        save_schedule(masks, batch_size)
+    return len(masks)
@@ -0,0 +1,122 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import BooleanField, Count, Q
+from django.db.models.expressions import RawSQL
+
+from .cache import catalog_version
+from .models import Product
+
+PRODUCT_TABLE = Product._meta.db_table
+PRODUCT_FTS_TABLE = f'{PRODUCT_TABLE}_fts'
+# The GIN index of migration 0008 is built on exactly this expression, so Postgres can use it.
+PRODUCT_DOCUMENT = "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))"
+PRICE_BUCKETS = ((None, 50), (50, 100), (100, 200), (200, None))
+
+
+def search_terms(query):
+    """
+    Splits a search phrase into lowercase words; anything else is dropped, so terms are safe
+    to embed in full-text query syntax.
+    """
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+def has_fts5_table():
+    return _has_fts5_table(connection.alias, connection.settings_dict['NAME'])
+
+
+@lru_cache
+def _has_fts5_table(alias, name):
+    # The table is missing when the SQLite build lacks FTS5; see migration 0008.
+    return PRODUCT_FTS_TABLE in connection.introspection.table_names()
+
+
+def match_products(queryset, query):
+    """
+    Narrows a Product queryset to the products whose name or description contain every word
+    of `query`, matching word prefixes.
+
+    Uses the Postgres full-text GIN index or the SQLite FTS5 table created by migration 0008,
+    and falls back to case-insensitive substring search elsewhere.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.filter(
+            RawSQL(f"{PRODUCT_DOCUMENT} @@ to_tsquery('simple', %s)", [tsquery], output_field=BooleanField())
+        )
+    if connection.vendor == 'sqlite' and has_fts5_table():
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {PRODUCT_FTS_TABLE} WHERE {PRODUCT_FTS_TABLE} MATCH %s', [match]
+        ))
+    for term in terms:
+        queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+    return queryset
+
+
+def price_q(min_price=None, max_price=None):
+    condition = Q()
+    if min_price is not None:
+        condition &= Q(price__gte=min_price)
+    if max_price is not None:
+        condition &= Q(price__lt=max_price)
+    return condition
+
+
+def search_products(queryset, query='', category=None, min_price=None, max_price=None):
+    """
+    Applies the text, category and price filters of the shop search to a Product queryset.
+    """
+    queryset = match_products(queryset, query)
+    if category is not None:
+        queryset = queryset.filter(categories=category)
+    return queryset.filter(price_q(min_price, max_price))
+
+
+def product_facets(categories, query='', category=None, min_price=None, max_price=None):
+    """
+    Counts the products matching a search per shop category and per price bucket, in one query.
+
+    Category counts keep the price filter and ignore the chosen category; price bucket counts
+    keep the chosen category and ignore the price filter, so every facet shows what choosing
+    it would return. `categories` is a list of Category objects.
+    """
+    matching = match_products(Product.objects.order_by(), query)
+    price = price_q(min_price, max_price)
+    chosen = Q(categories=category) if category is not None else Q()
+    aggregates = {
+        f'category_{item.pk}': Count('pk', filter=Q(categories=item.pk) & price, distinct=True)
+        for item in categories
+    }
+    aggregates.update({
+        f'price_{position}': Count('pk', filter=price_q(low, high) & chosen, distinct=True)
+        for position, (low, high) in enumerate(PRICE_BUCKETS)
+    })
+    counts = matching.aggregate(**aggregates)
+    return {
+        'categories': [(item, counts[f'category_{item.pk}']) for item in categories],
+        'prices': [(low, high, counts[f'price_{position}']) for position, (low, high) in enumerate(PRICE_BUCKETS)],
+    }
+
+
+def shop_facets(categories, **filters):
+    """
+    Returns product_facets() for the shop page. The counts of the unfiltered shop are the same for
+    every visitor and cost a COUNT(DISTINCT) per facet over all products, so they are cached until
+    the 'products' catalog changes; only a search or a filter counts live.
+    """
+    if filters:
+        return product_facets(categories, **filters)
+    key = f'shop_facets:{catalog_version("products")}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = product_facets(categories)
+        cache.set(key, facets, settings.CATALOG_CACHE_TIMEOUT)
+    return facets
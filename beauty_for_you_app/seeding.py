@@ -0,0 +1,169 @@
+import random
+from datetime import date, time, timedelta
+from decimal import Decimal
+from itertools import islice
+from math import ceil
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .availability import ALL_TIMES, OPENING_HOUR, slots_needed, working_days
+from .models import Category, Category_service, Product, Reservation, Services, Staff, StaffCategory
+from .schedule import rebuild_schedule
+
+SEED_PASSWORD = 'beauty4you'
+FIRST_NAMES = ('Anna', 'Maria', 'Katarzyna', 'Agnieszka', 'Ewa', 'Piotr', 'Tomasz', 'Marek', 'Joanna', 'Zofia')
+LAST_NAMES = ('Nowak', 'Kowalska', 'Wiśniewska', 'Wójcik', 'Kamińska', 'Lewandowski', 'Zielińska', 'Szymańska')
+SERVICE_NAMES = ('Strzyżenie', 'Koloryzacja', 'Manicure', 'Pedicure', 'Masaż', 'Henna', 'Peeling', 'Depilacja')
+
+
+def chunked(iterable, size):
+    """
+    Yields lists of at most `size` items without materializing the whole iterable.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Seeder:
+    """
+    Generates synthetic data with bulk inserts.
+
+    Rows are produced by generators and written in chunks of `batch_size`, together with
+    their many-to-many through rows, so memory use does not depend on the number of rows.
+    The same `seed` and `anchor` date always produce the same data; reservations are
+    spread around `anchor`, today by default.
+    """
+
+    def __init__(self, seed=1, batch_size=5000, log=None, anchor=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.anchor = anchor or date.today()
+
+    def insert(self, model, objects, through_rows=None, collect=True):
+        """
+        Inserts `objects` chunk by chunk; `through_rows(chunk)` returns {through_model: rows} for each chunk.
+        Returns the primary keys of the inserted objects, or only their number when `collect` is False.
+        """
+        pks, inserted = [], 0
+        for chunk in chunked(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk)
+                for through, rows in (through_rows(chunk) if through_rows else {}).items():
+                    through.objects.bulk_create(rows, batch_size=self.batch_size)
+            if collect:
+                pks.extend(obj.pk for obj in chunk)
+            inserted += len(chunk)
+            self.log(f'{model.__name__}: {inserted}')
+        return pks if collect else inserted
+
+    def seed(self, staff=40, categories=8, services=120, users=1000, shop_categories=10, products=10000,
+             reservations=100000):
+        rng = self.rng
+        category_ids = self.insert(Category_service, (
+            Category_service(name=f'Kategoria {i}') for i in range(categories)
+        ))
+        staff_ids = self.insert(Staff, (
+            Staff(first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                  phone=f'{rng.randrange(10 ** 8, 10 ** 9)}', position=rng.randint(1, 4), description='Opis')
+            for _ in range(staff)
+        ))
+        service_ids = self.insert(Services, (
+            Services(name=f'{rng.choice(SERVICE_NAMES)} {i}', price=Decimal(rng.randint(50, 400)),
+                     duration=rng.choice((30, 60, 90, 120)))
+            for i in range(services)
+        ), lambda chunk: {Services.category.through: [
+            Services.category.through(services_id=service.pk, category_service_id=rng.choice(category_ids))
+            for service in chunk
+        ]})
+        self.insert(StaffCategory, (
+            StaffCategory(staff_id=staff_id, category_service_id=rng.choice(category_ids))
+            for staff_id in staff_ids
+        ), collect=False)
+
+        user_ids = self.users(users)
+
+        shop_category_ids = self.insert(Category, (
+            Category(category_name=f'Dział {i}') for i in range(shop_categories)
+        ))
+        self.insert(Product, (
+            Product(name=f'Produkt {i}', description='Opis produktu', price=Decimal(rng.randint(1000, 50000)) / 100)
+            for i in range(products)
+        ), lambda chunk: {Product.categories.through: [
+            Product.categories.through(product_id=product.pk, category_id=rng.choice(shop_category_ids))
+            for product in chunk
+        ]}, collect=False)
+
+        if reservations and staff_ids and user_ids and service_ids:
+            durations = dict(Services.objects.filter(pk__in=service_ids).values_list('pk', 'duration'))
+            services = [(pk, durations[pk]) for pk in service_ids]
+            self.insert(Reservation, self.reservations(reservations, staff_ids, user_ids, services), lambda chunk: {
+                Reservation.service.through: [
+                    Reservation.service.through(reservation_id=reservation.pk, services_id=reservation.seed_service_id)
+                    for reservation in chunk
+                ],
+                Reservation.category_service.through: [
+                    Reservation.category_service.through(reservation_id=reservation.pk,
+                                                         category_service_id=rng.choice(category_ids))
+                    for reservation in chunk
+                ],
+            }, collect=False)
+            self.log(f'StaffDaySchedule: {rebuild_schedule(self.batch_size)}')
+
+    def users(self, count):
+        """
+        Inserts the `seed_user_<i>` users missing from the database and returns the ids of all of them,
+        so seeding again reuses the users of an earlier run.
+        """
+        password = make_password(SEED_PASSWORD)
+        user_ids = []
+        for chunk in chunked(range(count), self.batch_size):
+            usernames = [f'seed_user_{i}' for i in chunk]
+            User.objects.bulk_create([
+                User(username=username, email=f'{username}@example.com', password=password) for username in usernames
+            ], ignore_conflicts=True)
+            ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+            user_ids.extend(ids[username] for username in usernames)
+            self.log(f'User: {len(user_ids)}')
+        return user_ids
+
+    def reservations(self, count, staff_ids, user_ids, services):
+        """
+        Yields `count` non-overlapping reservations, half in the past and half upcoming, each with
+        a `seed_service_id` picked from `services`, a list of (id, duration) pairs.
+
+        Every working day of a staff member is split into blocks as long as the longest service, and
+        blocks are picked with selection sampling, so no list of all blocks is ever built. A shorter
+        service starts at a random slot of its block.
+        """
+        block = max(slots_needed(duration) for _, duration in services)
+        blocks_per_day = len(ALL_TIMES) // block
+        per_day = len(staff_ids) * blocks_per_day
+        # Fill roughly 80% of the blocks of the covered working days.
+        weeks = ceil(count / (per_day * 5 * 0.8)) + 1
+        first = self.anchor - timedelta(weeks=weeks // 2)
+        days = list(working_days(first, first + timedelta(weeks=weeks)))
+        total = len(days) * per_day
+        count = min(count, total)
+
+        selected = 0
+        for position in range(total):
+            if self.rng.random() * (total - position) >= count - selected:
+                continue
+            day, rest = divmod(position, per_day)
+            staff, start = divmod(rest, blocks_per_day)
+            service_id, duration = self.rng.choice(services)
+            slot = start * block + self.rng.randrange(block - slots_needed(duration) + 1)
+            reservation = Reservation(client_id=self.rng.choice(user_ids), staff_id=staff_ids[staff], date=days[day],
+                                      time=time(OPENING_HOUR + slot))
+            reservation.seed_service_id = service_id
+            yield reservation
+            selected += 1
+            if selected == count:
+                return
@@ -0,0 +1,137 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .auth import user_cache_key
+from .cache import MODEL_CATALOGS, bump_catalog
+from .conditional import mark_deleted
+from .models import Category, Category_service, Product, Reservation, Services, Staff, StaffCategory
+from .schedule import refresh_schedule
+
+
+@receiver(post_save, sender=Category_service)
+@receiver(post_save, sender=Services)
+@receiver(post_save, sender=Staff)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=StaffCategory)
+@receiver(post_delete, sender=Category_service)
+@receiver(post_delete, sender=Services)
+@receiver(post_delete, sender=Staff)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=StaffCategory)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog(*MODEL_CATALOGS[sender])
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def invalidate_product_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_catalog('products')
+        touch(Product, instance, reverse, pk_set)
+
+
+def touch(model, instance, reverse, pk_set):
+    """
+    Bumps updated_at of the rows whose many-to-many relations changed, for conditional GET.
+    """
+    pks = pk_set if reverse else {instance.pk}
+    if pks:
+        model.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Category_service)
+@receiver(post_delete, sender=Services)
+@receiver(post_delete, sender=Staff)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def record_deletion(sender, **kwargs):
+    mark_deleted(sender)
+
+
+@receiver(m2m_changed, sender=Services.category.through)
+def invalidate_service_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_catalog('services', 'category_choices')
+        touch(Services, instance, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=StaffCategory)
+def invalidate_staff_categories(sender, action, **kwargs):
+    # Staff.categories.add() and friends write StaffCategory rows without their save/delete signals.
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_catalog('staff_categories')
+
+
+@receiver(post_delete, sender=Category_service)
+@receiver(post_delete, sender=Services)
+def invalidate_category_choices(sender, **kwargs):
+    bump_catalog('category_choices')
+
+
+@receiver(pre_save, sender=Reservation)
+def remember_schedule_day(sender, instance, **kwargs):
+    # A moved reservation frees its previous day, which post_save has to refresh as well.
+    if instance.pk:
+        instance._previous_schedule_day = (
+            Reservation.objects.filter(pk=instance.pk).values_list('staff_id', 'date').first()
+        )
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def update_schedule(sender, instance, **kwargs):
+    if isinstance(kwargs.get('origin'), Staff):
+        # Deleting a staff member cascades to their schedule rows as well.
+        return
+    days = {(instance.staff_id, instance.date)}
+    previous = getattr(instance, '_previous_schedule_day', None)
+    if previous:
+        days.add(previous)
+    refresh_schedule(days)
+
+
+@receiver(m2m_changed, sender=Reservation.service.through)
+def update_schedule_services(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        refresh_schedule([(instance.staff_id, instance.date)])
+    elif pk_set:
+        refresh_schedule(Reservation.objects.filter(pk__in=pk_set).values_list('staff_id', 'date'))
+
+
+@receiver(post_save, sender=Services)
+def update_schedule_durations(sender, instance, created, **kwargs):
+    if not created:
+        refresh_schedule(
+            Reservation.objects
+            .filter(service=instance, date__gte=date.today())
+            .values_list('staff_id', 'date').distinct()
+        )
+
+
+@receiver(pre_delete, sender=Services)
+def remember_service_days(sender, instance, **kwargs):
+    # The cascade removes the reservation_service rows without m2m_changed, so post_delete refreshes these days.
+    instance._schedule_days = list(
+        Reservation.objects
+        .filter(service=instance, date__gte=date.today())
+        .values_list('staff_id', 'date').distinct()
+    )
+
+
+@receiver(post_delete, sender=Services)
+def update_schedule_deleted_service(sender, instance, **kwargs):
+    refresh_schedule(getattr(instance, '_schedule_days', ()))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.pk))
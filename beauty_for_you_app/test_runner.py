@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_STATICFILES_STORAGE = {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the tests with settings.QUERY_BUDGET_RAISE enabled, so every view exceeding its query
+    budget fails the test that requested it, and with plain StaticFilesStorage, so templates
+    render before collectstatic has built the manifest.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGET_RAISE = True
+        self.static_storage = override_settings(STORAGES={**settings.STORAGES, 'staticfiles': TEST_STATICFILES_STORAGE})
+        self.static_storage.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.static_storage.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,9 +1,44 @@
+import csv
+import json
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import PermissionDenied
+from django.db import connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from datetime import date, time
+from django.utils import timezone
+from datetime import date, datetime, time, timedelta
 
-from .models import Staff, Category_service, Services, Reservation
+from .auth import EmailOrUsernameBackend, user_cache_key, users_with_email
+from .availability import ALL_TIMES, free_slots, occupied_slots, slot_mask, slots_needed
+from .booking import BookingError, book_reservation, reschedule_reservation
+from .cache import catalog_stats, catalog_version, category_choice_ids, get_catalog, staff_category_map
+from .checks import check_cached_sessions, check_connection_settings, check_shared_cache, describe_connection
+from .middleware import QueryBudgetExceeded, QueryRecorder
+from .pagination import KeysetPaginator
+from .routers import PIN_COOKIE, PrimaryReplicaRouter, RequestRouting, activate_routing, deactivate_routing
+from .schedule import refresh_schedule
+from .search import has_fts5_table, product_facets, search_products, shop_facets
+from .throttling import client_ip, take_token
+from .models import Staff, Category_service, Services, Reservation, Category, Product, StaffCategory, \
+    StaffDaySchedule, ReservationArchive
 from .form import AddStaffForm, UserCreateForm
 
 class TestStaffCreate(TestCase):
@@ -166,3 +201,1608 @@ class ServiceUpdateViewTest(TestCase):
         self.assertEqual(updated_service.price, updated_data['price'])
         self.assertEqual(updated_service.duration, updated_data['duration'])
         self.assertListEqual(list(updated_service.category.all()), [self.category])
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class TestAvailability(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.service = Services.objects.create(name='Long Service', price=10.0, duration=90)
+        self.monday = date.today() + timedelta(days=7 - date.today().weekday())
+
+        reservation = Reservation.objects.create(client=self.user, staff=self.employee, date=self.monday,
+                                                 time=time(10, 0))
+        reservation.service.add(self.service)
+
+    def test_free_slots_block_service_duration(self):
+        slots = free_slots(self.employee.pk, self.monday, self.monday)
+
+        self.assertNotIn('10:00', slots[self.monday])
+        self.assertNotIn('11:00', slots[self.monday])
+        self.assertIn('09:00', slots[self.monday])
+        self.assertIn('12:00', slots[self.monday])
+
+    def test_free_slots_fit_requested_duration(self):
+        slots = free_slots(self.employee.pk, self.monday, self.monday, duration=120)
+
+        self.assertNotIn('09:00', slots[self.monday])
+        self.assertIn('08:00', slots[self.monday])
+        self.assertNotIn('15:00', slots[self.monday])
+
+    def test_free_slots_skip_started_slots_today(self):
+        now = timezone.make_aware(datetime.combine(self.monday, time(10, 30)))
+
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            slots = free_slots(self.employee.pk, self.monday - timedelta(days=7), self.monday)
+            with self.assertRaises(BookingError):
+                book_reservation(self.user, self.employee, self.service, Category_service.objects.create(name='A'),
+                                 self.monday, time(9, 0))
+
+        self.assertEqual(slots, {self.monday: ['12:00', '13:00', '14:00', '15:00']})
+
+    def test_free_slots_skip_weekends(self):
+        slots = free_slots(self.employee.pk, self.monday, self.monday + timedelta(days=6))
+
+        self.assertEqual(len(slots), 5)
+
+    def test_get(self):
+        url = reverse('availability', args=[self.employee.pk])
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'date_from': self.monday.isoformat(),
+                                             'date_to': self.monday.isoformat(),
+                                             'service': self.service.pk})
+
+        self.assertEqual(response.status_code, 200)
+        times = response.json()['slots'][self.monday.isoformat()]
+        self.assertNotIn('09:00', times)
+        self.assertIn('12:00', times)
+
+    def test_get_invalid_range(self):
+        url = reverse('availability', args=[self.employee.pk])
+        response = self.client.get(url, {'date_from': self.monday.isoformat(), 'date_to': '2000-01-01'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class TestStaffDaySchedule(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.service = Services.objects.create(name='Long Service', price=10.0, duration=90)
+        self.monday = date.today() + timedelta(days=7 - date.today().weekday())
+        self.reservation = book_reservation(self.user, self.employee, self.service,
+                                            Category_service.objects.create(name='Test Category'),
+                                            self.monday, time(10, 0))
+
+    def occupied(self, day=None):
+        return occupied_slots(self.employee.pk, day or self.monday, day or self.monday).get(day or self.monday)
+
+    def test_booking_marks_service_duration(self):
+        self.assertEqual(self.occupied(), slot_mask(time(10, 0), 90))
+        self.assertEqual(self.occupied(), 0b11000)
+
+    def test_booking_updates_locked_row(self):
+        # Savepoint, lock, three inserts, the bitmap update and the release; no refresh from the reservations.
+        category_service = self.reservation.category_service.get()
+
+        with self.assertNumQueries(8):
+            book_reservation(self.user, self.employee, self.service, category_service, self.monday, time(13, 0))
+
+        self.assertEqual(self.occupied(), slot_mask(time(10, 0), 90) | slot_mask(time(13, 0), 90))
+
+    def test_booking_past_closing(self):
+        with self.assertRaises(BookingError) as raised:
+            book_reservation(self.user, self.employee, self.service, self.reservation.category_service.get(),
+                             self.monday, time(15, 0))
+
+        self.assertEqual(raised.exception.status, 409)
+
+    def test_free_slots_read_one_row(self):
+        with self.assertNumQueries(1):
+            free_slots(self.employee.pk, self.monday, self.monday + timedelta(days=30))
+
+    def test_delete_frees_day(self):
+        self.reservation.delete()
+
+        self.assertFalse(StaffDaySchedule.objects.exists())
+
+    def test_deleted_service_frees_slots(self):
+        short_service = Services.objects.create(name='Short Service', price=10.0, duration=60)
+        self.reservation.service.add(short_service)
+        self.service.delete()
+
+        self.assertEqual(self.occupied(), slot_mask(time(10, 0), 60))
+
+    def test_refresh_locks_days_before_reading(self):
+        with CaptureQueriesContext(connection) as queries:
+            refresh_schedule([(self.employee.pk, self.monday)])
+
+        tables = [('schedule' if 'staffdayschedule' in query['sql'].split('WHERE')[0] else 'reservations')
+                  for query in queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(tables, ['schedule', 'reservations'])
+        self.assertEqual(self.occupied(), slot_mask(time(10, 0), 90))
+
+    def test_staff_delete(self):
+        self.employee.delete()
+
+        self.assertFalse(StaffDaySchedule.objects.exists())
+
+    def test_update_view_moves_reservation(self):
+        tuesday = self.monday + timedelta(days=1)
+        url = reverse('update_reservation', args=[self.reservation.pk])
+        self.client.login(username='testuser', password='testpassword')
+
+        self.client.post(url, {'date': tuesday.isoformat(), 'time': '08:00'})
+
+        self.assertIsNone(self.occupied())
+        self.assertEqual(self.occupied(tuesday), slot_mask(time(8, 0), 90))
+
+    def test_service_duration_change(self):
+        self.service.duration = 180
+        self.service.save()
+
+        self.assertEqual(self.occupied(), 0b111000)
+
+    def test_rebuild_command(self):
+        Reservation.objects.create(client=self.user, staff=self.employee, date=self.monday, time=time(7, 0))
+        StaffDaySchedule.objects.update(occupied=0)
+        out = StringIO()
+
+        call_command('rebuild_schedule', stdout=out)
+
+        self.assertEqual(self.occupied(), 0b11001)
+        self.assertIn('1', out.getvalue())
+
+
+class TestReservationReschedule(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.other = User.objects.create_user(username='other', password='testpassword')
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.service = Services.objects.create(name='Long Service', price=10.0, duration=90)
+        self.category_service = Category_service.objects.create(name='Test Category')
+        self.monday = date.today() + timedelta(days=7 - date.today().weekday())
+        self.reservation = book_reservation(self.user, self.employee, self.service, self.category_service,
+                                            self.monday, time(10, 0))
+        self.foreign = book_reservation(self.other, self.employee, self.service, self.category_service,
+                                        self.monday, time(13, 0))
+        self.client.login(username='testuser', password='testpassword')
+
+    def post(self, reservation, day, hour):
+        url = reverse('update_reservation', args=[reservation.pk])
+        return self.client.post(url, {'date': day.isoformat(), 'time': hour})
+
+    def test_moves_only_own_reservation(self):
+        tuesday = self.monday + timedelta(days=1)
+
+        response = self.post(self.reservation, tuesday, '08:00')
+
+        self.assertRedirects(response, reverse('my_reservation'))
+        self.reservation.refresh_from_db()
+        self.foreign.refresh_from_db()
+        self.assertEqual((self.reservation.date, self.reservation.time), (tuesday, time(8, 0)))
+        self.assertEqual((self.foreign.date, self.foreign.time), (self.monday, time(13, 0)))
+
+    def test_writes_one_row(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.post(self.reservation, self.monday + timedelta(days=1), '08:00')
+
+        updates = [query['sql'] for query in queries
+                   if query['sql'].startswith('UPDATE "beauty_for_you_app_reservation"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('WHERE "beauty_for_you_app_reservation"."id" =', updates[0])
+
+    def test_foreign_reservation(self):
+        response = self.post(self.foreign, self.monday + timedelta(days=1), '08:00')
+
+        self.assertEqual(response.status_code, 404)
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.time, time(13, 0))
+
+    def test_login_required(self):
+        self.client.logout()
+
+        response = self.post(self.reservation, self.monday + timedelta(days=1), '08:00')
+
+        self.assertEqual(response.status_code, 302)
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.date, self.monday)
+
+    def test_overlapping_slot(self):
+        response = self.post(self.reservation, self.monday, '12:00')
+
+        self.assertEqual(response.status_code, 409)
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.time, time(10, 0))
+
+    def test_overlap_with_own_previous_slot(self):
+        response = self.post(self.reservation, self.monday, '11:00')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(occupied_slots(self.employee.pk, self.monday, self.monday)[self.monday],
+                         slot_mask(time(11, 0), 90) | slot_mask(time(13, 0), 90))
+
+    def test_weekend(self):
+        response = self.post(self.reservation, self.monday + timedelta(days=5), '08:00')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Nie pracujemy w weekendy')
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class TestConcurrentReschedule(TransactionTestCase):
+    def setUp(self):
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        service = Services.objects.create(name='Service', price=10.0, duration=60)
+        self.category_service = Category_service.objects.create(name='Test Category')
+        self.monday = date.today() + timedelta(days=7 - date.today().weekday())
+        self.users = [User.objects.create_user(username=f'user{i}', password='testpassword') for i in range(2)]
+        self.reservations = [
+            book_reservation(user, self.employee, service, self.category_service, self.monday, time(8 + i, 0))
+            for i, user in enumerate(self.users)
+        ]
+
+    def race(self, *actions):
+        barrier = threading.Barrier(len(actions))
+        results = []
+
+        def run(action):
+            barrier.wait()
+            try:
+                action()
+                results.append('done')
+            except BookingError as error:
+                results.append(error.status)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=[action]) for action in actions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(results, key=str)
+
+    def test_booking_overlapping_move(self):
+        long_service = Services.objects.create(name='Long Service', price=10.0, duration=120)
+
+        results = self.race(
+            lambda: reschedule_reservation(self.users[0], self.reservations[0].pk, self.monday, time(12, 0)),
+            lambda: book_reservation(self.users[1], self.employee, long_service, self.category_service,
+                                     self.monday, time(11, 0)),
+        )
+
+        # The 11:00-13:00 booking and the move to 12:00 overlap, so only one of them may win.
+        self.assertEqual(results, [409, 'done'])
+        self.assertEqual(Reservation.objects.filter(time__in=[time(11, 0), time(12, 0)]).count(), 1)
+
+    def test_booking_during_delete(self):
+        # The refresh after the delete must not write back a bitmap read before the booking committed.
+        results = self.race(
+            lambda: Reservation.objects.get(pk=self.reservations[0].pk).delete(),
+            lambda: book_reservation(self.users[1], self.employee, self.reservations[1].service.get(),
+                                     self.category_service, self.monday, time(12, 0)),
+        )
+
+        self.assertEqual(results, ['done', 'done'])
+        self.assertEqual(occupied_slots(self.employee.pk, self.monday, self.monday)[self.monday],
+                         slot_mask(time(9, 0), 60) | slot_mask(time(12, 0), 60))
+
+    def test_booking_on_day_moved_from(self):
+        tuesday = self.monday + timedelta(days=1)
+
+        results = self.race(
+            lambda: reschedule_reservation(self.users[0], self.reservations[0].pk, tuesday, time(10, 0)),
+            lambda: book_reservation(self.users[1], self.employee, self.reservations[1].service.get(),
+                                     self.category_service, self.monday, time(12, 0)),
+        )
+
+        self.assertEqual(results, ['done', 'done'])
+        self.assertEqual(occupied_slots(self.employee.pk, self.monday, tuesday), {
+            self.monday: slot_mask(time(9, 0), 60) | slot_mask(time(12, 0), 60),
+            tuesday: slot_mask(time(10, 0), 60),
+        })
+
+    def test_same_target_slot(self):
+        results = self.race(*[
+            lambda user=user, reservation=reservation:
+                reschedule_reservation(user, reservation.pk, self.monday, time(12, 0))
+            for user, reservation in zip(self.users, self.reservations)
+        ])
+
+        self.assertEqual(results, [409, 'done'])
+        self.assertEqual(Reservation.objects.filter(time=time(12, 0)).count(), 1)
+
+
+class TestDatabaseRouting(TransactionTestCase):
+    # A TransactionTestCase: TestCase runs every test in a transaction, which keeps all reads on the primary.
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.service = Services.objects.create(name='Service', price=10.0, duration=60)
+        self.category_service = Category_service.objects.create(name='Test Category')
+        self.service.category.add(self.category_service)
+        self.employee.categories.add(self.category_service)
+        cache.clear()
+
+    def read_db(self, routing, model=Staff):
+        token = activate_routing(routing)
+        try:
+            return self.router.db_for_read(model)
+        finally:
+            deactivate_routing(token)
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_router(self):
+        routing = RequestRouting()
+        self.assertEqual(self.read_db(routing), 'default')
+
+        routing.replica_reads = True
+        self.assertEqual(self.read_db(routing), 'replica')
+        self.assertIsNone(self.read_db(routing, User))
+        with transaction.atomic():
+            self.assertEqual(self.read_db(routing), 'default')
+
+        token = activate_routing(routing)
+        self.assertEqual(self.router.db_for_write(Reservation), 'default')
+        deactivate_routing(token)
+        self.assertEqual(self.read_db(routing), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_catalog_view_reads_from_replica(self):
+        response = self.client.get(reverse('staff'))
+
+        self.assertEqual(response.wsgi_request.database_routing.replica, 'default')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_own_writes_pin_primary(self):
+        self.client.login(username='testuser', password='testpassword')
+        monday = date.today() + timedelta(days=7 - date.today().weekday())
+
+        response = self.client.post(reverse('reservation', args=[self.category_service.pk]), {
+            'staff': self.employee.pk, 'service': self.service.pk, 'date': monday, 'time': '10:00',
+        })
+
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response = self.client.get(reverse('my_reservation'))
+        self.assertIsNone(response.wsgi_request.database_routing.replica)
+        self.assertContains(response, 'John Doe')
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_catalog_change_pins_primary(self):
+        Staff.objects.create(first_name='Jane', last_name='Doe', phone='123456789', position=1)
+
+        response = self.client.get(reverse('staff'))
+
+        self.assertIsNone(response.wsgi_request.database_routing.replica)
+        self.assertContains(response, 'Jane Doe')
+
+
+class TestConnectionChecks(TestCase):
+    def test_persistent_connections_without_health_checks(self):
+        with mock.patch.dict(connections.settings['default'], CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=False):
+            errors = check_connection_settings(None)
+            report = describe_connection('default')
+
+        self.assertEqual([error.id for error in errors], ['beauty_for_you_app.W001'])
+        self.assertIn('reused for 60s, health checks off', report)
+
+    def test_health_checked(self):
+        with mock.patch.dict(connections.settings['default'], CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True):
+            self.assertEqual(check_connection_settings(None), [])
+
+    def test_process_local_cache(self):
+        with override_settings(SHARED_CACHE=False):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['beauty_for_you_app.W002'])
+        with override_settings(SHARED_CACHE=True):
+            self.assertEqual(check_shared_cache(None), [])
+        # The default session store and user cache are the ones safe without a shared cache.
+        self.assertEqual(check_cached_sessions(None), [])
+
+
+class TestReservationIndexes(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.service = Services.objects.create(name='Test Service', price=10.0, duration=60)
+        self.category_service = Category_service.objects.create(name='Test Category')
+        self.monday = date.today() + timedelta(days=7 - date.today().weekday())
+
+    def explain(self, queryset):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # The test tables are tiny, make sure the planner does not prefer a sequential scan.
+                cursor.execute('SET enable_seqscan = off')
+        return queryset.explain()
+
+    def test_slot_lookup_uses_index(self):
+        plan = self.explain(Reservation.objects.filter(staff=self.employee, date=self.monday, time=time(10, 0)))
+
+        self.assertIn('reservation_unique_staff_slot', plan)
+
+    def test_client_history_uses_index(self):
+        plan = self.explain(Reservation.objects.filter(client=self.user, date__gte=self.monday))
+
+        self.assertIn('reservation_client_date_idx', plan)
+
+    def test_post_taken_slot(self):
+        Reservation.objects.create(client=self.user, staff=self.employee, date=self.monday, time=time(10, 0))
+        self.employee.categories.add(self.category_service)
+        self.service.category.add(self.category_service)
+        self.client.login(username='testuser', password='testpassword')
+
+        response = self.client.post(reverse('reservation', args=[self.category_service.pk]), {
+            'staff': self.employee.pk,
+            'service': self.service.pk,
+            'date': self.monday.isoformat(),
+            'time': '10:00',
+        })
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class TestReservationArchive(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.service = Services.objects.create(name='Manicure', price=10.0, duration=60)
+        self.category_service = Category_service.objects.create(name='Paznokcie')
+        self.today = date.today()
+        for days in (-30, -20, -10, 3):
+            self.reserve(self.today + timedelta(days=days))
+        self.client.login(username='testuser', password='testpassword')
+
+    def reserve(self, day):
+        reservation = Reservation.objects.create(client=self.user, staff=self.employee, date=day, time=time(10, 0))
+        reservation.service.add(self.service)
+        reservation.category_service.add(self.category_service)
+        return reservation
+
+    def test_command(self):
+        out = StringIO()
+        call_command('archive_reservations', batch_size=2, stdout=out)
+
+        self.assertIn('Archived 3 reservations', out.getvalue())
+        self.assertEqual(list(Reservation.objects.values_list('date', flat=True)), [self.today + timedelta(days=3)])
+        archived = ReservationArchive.objects.order_by('date').first()
+        self.assertEqual(archived.date, self.today - timedelta(days=30))
+        self.assertEqual((archived.staff_name, archived.services, archived.category_services),
+                         ('John Doe', ['Manicure'], ['Paznokcie']))
+        self.assertFalse(StaffDaySchedule.objects.filter(date__lt=self.today).exists())
+
+        call_command('archive_reservations', stdout=out)
+        self.assertEqual(ReservationArchive.objects.count(), 3)
+
+    def test_my_reservation_shows_upcoming(self):
+        response = self.client.get(reverse('my_reservation'))
+
+        self.assertEqual([reservation.date for reservation in response.context['reservations']],
+                         [self.today + timedelta(days=3)])
+        self.assertNotIn('archive', response.context)
+
+    def test_history(self):
+        call_command('archive_reservations', stdout=StringIO())
+        self.reserve(self.today - timedelta(days=1))
+
+        response = self.client.get(reverse('my_reservation'), {'history': '1'})
+
+        self.assertEqual([reservation.date for reservation in response.context['archive']],
+                         [self.today + timedelta(days=days) for days in (-30, -20, -10)])
+        self.assertEqual([reservation.date for reservation in response.context['reservations']],
+                         [self.today - timedelta(days=1)])
+        self.assertContains(response, 'Manicure', count=4)
+
+    def test_history_paginates_unarchived(self):
+        call_command('archive_reservations', stdout=StringIO())
+        for days in range(1, 13):
+            self.reserve(self.today - timedelta(days=days))
+
+        response = self.client.get(reverse('my_reservation'), {'history': '1'})
+        pending = response.context['pending']
+        following = self.client.get(reverse('my_reservation'), {'history': '1', 'pending': pending.next_cursor})
+
+        self.assertEqual(len(response.context['archive']), 3)
+        self.assertEqual([reservation.date for reservation in pending],
+                         [self.today - timedelta(days=days) for days in range(12, 2, -1)])
+        self.assertEqual([reservation.date for reservation in following.context['reservations']],
+                         [self.today - timedelta(days=days) for days in (2, 1)])
+        self.assertContains(response, f'pending={pending.next_cursor}')
+
+
+class TestListQueryCount(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.category_service = Category_service.objects.create(name='Test Category')
+        self.category = Category.objects.create(category_name='Kosmetyki')
+        self.client.login(username='testuser', password='testpassword')
+
+    def add_rows(self, count):
+        start = Services.objects.count()
+        for i in range(start, start + count):
+            service = Services.objects.create(name=f'Service {i}', price=10.0, duration=60)
+            service.category.add(self.category_service)
+            reservation = Reservation.objects.create(client=self.user, staff=self.employee,
+                                                     date=date.today() + timedelta(days=i), time=time(10, 0))
+            reservation.service.add(service)
+            reservation.category_service.add(self.category_service)
+            product = Product.objects.create(name=f'Product {i}', description='opis', price=10.0)
+            product.categories.add(self.category)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url):
+        # Warm up the catalog caches the rows below do not invalidate, e.g. the shop categories.
+        self.count_queries(url)
+        self.add_rows(1)
+        single = self.count_queries(url)
+        self.add_rows(8)
+        self.assertEqual(self.count_queries(url), single)
+
+    def test_my_reservation(self):
+        self.assertConstantQueries(reverse('my_reservation'))
+
+    def test_service_list(self):
+        self.assertConstantQueries(reverse('service_list'))
+
+    def test_shop(self):
+        self.assertConstantQueries('/shop/')
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class TestQueryCountMiddleware(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.client.login(username='testuser', password='testpassword')
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('my_reservation'))
+
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries"')
+
+    def test_budget_exceeded(self):
+        with override_settings(QUERY_BUDGETS={'my_reservation': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('my_reservation'))
+
+    def test_budget_per_method(self):
+        with override_settings(QUERY_BUDGETS={'my_reservation': {'POST': 1}}):
+            response = self.client.get(reverse('my_reservation'))
+
+        self.assertEqual(response.status_code, 200)
+        with override_settings(QUERY_BUDGETS={'my_reservation': {'GET': 0}}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('my_reservation'))
+
+    def test_request_logged(self):
+        with self.assertLogs('beauty_for_you_app.queries', level='INFO') as logs:
+            self.client.get(reverse('my_reservation'))
+
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(entry['url_name'], 'my_reservation')
+        self.assertEqual(entry['duplicates'], 0)
+
+    def test_duplicate_queries(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for reservation_id in range(3):
+                Reservation.objects.filter(pk=reservation_id).first()
+            Staff.objects.first()
+
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(list(recorder.duplicates().values()), [3])
+
+
+class TestCatalogCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category_service = Category_service.objects.create(name='Test Category')
+        self.service = Services.objects.create(name='Test Service', price=10.0, duration=60)
+
+    def test_get_catalog_cached(self):
+        get_catalog('services')
+        with self.assertNumQueries(0):
+            services = get_catalog('services')
+
+        self.assertEqual([service.name for service in services], ['Test Service'])
+        self.assertEqual(catalog_stats()['services']['hits'], 1)
+        self.assertEqual(catalog_stats()['services']['misses'], 1)
+
+    def test_invalidated_on_save(self):
+        get_catalog('services')
+        self.service.name = 'Renamed Service'
+        self.service.save()
+
+        self.assertEqual([service.name for service in get_catalog('services')], ['Renamed Service'])
+
+    def test_evicted_version_does_not_restore_entries(self):
+        get_catalog('services')
+        cache.delete('catalog:version:services')
+        Services.objects.filter(pk=self.service.pk).update(name='Renamed Service')
+
+        self.assertEqual([service.name for service in get_catalog('services')], ['Renamed Service'])
+
+    def test_invalidated_on_m2m_change(self):
+        get_catalog('services')
+        self.service.category.add(self.category_service)
+
+        services = get_catalog('services')
+        with self.assertNumQueries(0):
+            self.assertEqual(list(services[0].category.all()), [self.category_service])
+
+    def test_invalidated_by_related_category(self):
+        self.service.category.add(self.category_service)
+        get_catalog('services')
+        self.category_service.name = 'Renamed Category'
+        self.category_service.save()
+
+        services = get_catalog('services')
+        self.assertEqual(services[0].category.all()[0].name, 'Renamed Category')
+
+    def test_invalidated_on_delete(self):
+        staff = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.assertEqual(len(get_catalog('staff')), 1)
+        staff.delete()
+
+        self.assertEqual(get_catalog('staff'), [])
+
+
+class TestTemplateFragmentCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff_user = User.objects.create_user(username='admin', password='testpassword', is_staff=True)
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.category = Category.objects.create(category_name='Kosmetyki')
+        self.product = Product.objects.create(name='Krem', description='Opis', price=10)
+        self.product.categories.add(self.category)
+
+    def test_fragment_cached(self):
+        response = self.client.get(reverse('staff'))
+
+        key = make_template_fragment_key('staff_list', [catalog_version('staff'), False])
+        self.assertIn('John Doe', cache.get(key))
+        self.assertContains(response, 'John Doe')
+
+    def test_compiled_templates_cached_in_debug(self):
+        # settings.py turns DEBUG on, which TEMPLATES is built with; the loaders must be cached anyway.
+        loader, = engines['django'].engine.template_loaders
+
+        self.assertIsInstance(loader, CachedLoader)
+
+    def test_staff_buttons_vary_on_user(self):
+        self.client.get(reverse('staff'))
+        self.client.login(username='admin', password='testpassword')
+
+        response = self.client.get(reverse('staff'))
+
+        self.assertContains(response, f'/delete_staff/{self.employee.pk}')
+        self.client.logout()
+        self.assertNotContains(self.client.get(reverse('staff')), '/delete_staff/')
+
+    def test_staff_save_invalidates_fragment(self):
+        self.client.get(reverse('staff'))
+        self.employee.first_name = 'Jane'
+        self.employee.save()
+
+        self.assertContains(self.client.get(reverse('staff')), 'Jane Doe')
+
+    def test_product_changes_invalidate_shop(self):
+        self.client.get('/shop/')
+        self.product.name = 'Szampon'
+        self.product.save()
+        self.category.category_name = 'Włosy'
+        self.category.save()
+
+        response = self.client.get('/shop/')
+
+        self.assertContains(response, 'Szampon')
+        self.assertContains(response, 'Włosy')
+
+    def test_product_category_change_invalidates_shop(self):
+        self.client.get('/shop/')
+        self.product.categories.add(Category.objects.create(category_name='Promocje'))
+
+        self.assertContains(self.client.get('/shop/'), 'Promocje')
+
+
+class TestConditionalGet(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff_user = User.objects.create_user(username='admin', password='testpassword', is_staff=True)
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.category_service = Category_service.objects.create(name='Test Category')
+        self.service = Services.objects.create(name='Test Service', price=10.0, duration=60)
+
+    def test_not_modified(self):
+        response = self.client.get(reverse('staff'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertIn('Cookie', response['Vary'])
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(reverse('staff'), HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+
+    def test_if_modified_since(self):
+        response = self.client.get(reverse('staff'))
+
+        cached = self.client.get(reverse('staff'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+
+        self.assertEqual(cached.status_code, 304)
+
+    def test_modified_after_save(self):
+        etag = self.client.get(reverse('staff'))['ETag']
+        self.employee.first_name = 'Jane'
+        self.employee.save()
+
+        response = self.client.get(reverse('staff'), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Jane Doe')
+
+    def test_modified_after_delete(self):
+        Staff.objects.create(first_name='Jane', last_name='Doe', phone='123456789', position=1)
+        etag = self.client.get(reverse('staff'))['ETag']
+        self.employee.delete()
+
+        response = self.client.get(reverse('staff'), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'John Doe')
+
+    def test_modified_after_category_change(self):
+        etag = self.client.get(reverse('service_list'))['ETag']
+        self.service.category.add(self.category_service)
+
+        response = self.client.get(reverse('service_list'), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Test Category')
+
+    def test_etag_varies_on_user(self):
+        anonymous = self.client.get(reverse('staff'))['ETag']
+        self.client.login(username='admin', password='testpassword')
+
+        response = self.client.get(reverse('staff'), HTTP_IF_NONE_MATCH=anonymous)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/delete_staff/')
+
+
+class TestKeysetPagination(TestCase):
+    def setUp(self):
+        for i in range(25):
+            Product.objects.create(name=f'Product {i}', description='opis', price=i % 5)
+        self.ordered = list(Product.objects.order_by('price', 'id'))
+        self.paginator = KeysetPaginator(Product.objects.all(), ('price', 'id'), 10)
+
+    def test_walk_forward_and_back(self):
+        first = self.paginator.get_page()
+        second = self.paginator.get_page(first.next_cursor)
+        third = self.paginator.get_page(second.next_cursor)
+
+        self.assertEqual(list(first) + list(second) + list(third), self.ordered)
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+        self.assertEqual(list(self.paginator.get_page(third.previous_cursor)), self.ordered[10:20])
+        self.assertEqual(list(self.paginator.get_page(second.previous_cursor)), self.ordered[:10])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(list(self.paginator.get_page('not-a-cursor')), self.ordered[:10])
+
+    def test_count_skipped_by_default(self):
+        with self.assertNumQueries(1):
+            page = self.paginator.get_page()
+        self.assertIsNone(page.count)
+
+        page = KeysetPaginator(Product.objects.all(), ('price', 'id'), 10, count=True).get_page()
+        self.assertEqual(page.count, 25)
+
+    def test_shop_view(self):
+        response = self.client.get('/shop/')
+        next_cursor = response.context['shop'].next_cursor
+
+        response = self.client.get('/shop/', {'cursor': next_cursor})
+        self.assertEqual(list(response.context['shop']), self.ordered[10:20])
+
+    def test_reservations_without_time(self):
+        user = User.objects.create_user(username='testuser', password='testpassword')
+        employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        monday = date.today() + timedelta(days=7 - date.today().weekday())
+        for hour in range(7, 17):
+            Reservation.objects.create(client=user, staff=employee, date=monday, time=time(hour, 0))
+        untimed = Reservation.objects.create(client=user, staff=employee, date=monday, time=None)
+        self.client.login(username='testuser', password='testpassword')
+
+        first = self.client.get(reverse('my_reservation')).context['page']
+        second = self.client.get(reverse('my_reservation'), {'cursor': first.next_cursor}).context['page']
+
+        self.assertEqual(first[0], untimed)
+        self.assertEqual(len(first) + len(second), 11)
+        self.assertEqual([reservation.time for reservation in second], [time(16, 0)])
+
+
+class TestProductSearch(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.hair = Category.objects.create(category_name='Włosy')
+        self.face = Category.objects.create(category_name='Twarz')
+        self.shampoo = Product.objects.create(name='Szampon ziołowy', description='Do włosów suchych', price=30)
+        self.conditioner = Product.objects.create(name='Odżywka', description='Ziołowa, do włosów', price=80)
+        self.cream = Product.objects.create(name='Krem nawilżający', description='Do twarzy', price=150)
+        self.shampoo.categories.add(self.hair)
+        self.conditioner.categories.add(self.hair)
+        self.cream.categories.add(self.face)
+
+    def search(self, **filters):
+        return set(search_products(Product.objects.all(), **filters))
+
+    def test_text_search(self):
+        self.assertEqual(self.search(query='ziołow'), {self.shampoo, self.conditioner})
+        self.assertEqual(self.search(query='ZIOŁOWY szampon'), {self.shampoo})
+        self.assertEqual(self.search(query='włosów krem'), set())
+        self.assertEqual(self.search(query='"); --'), {self.shampoo, self.conditioner, self.cream})
+
+    def test_search_follows_product_changes(self):
+        self.cream.description = 'Do twarzy i szyi'
+        self.cream.save()
+        self.shampoo.delete()
+
+        self.assertEqual(self.search(query='szyi'), {self.cream})
+        self.assertEqual(self.search(query='szampon'), set())
+
+    def test_category_and_price_filters(self):
+        self.assertEqual(self.search(category=self.hair.pk, min_price=50), {self.conditioner})
+        self.assertEqual(self.search(max_price=100), {self.shampoo, self.conditioner})
+
+    def test_facets_in_one_query(self):
+        has_fts5_table()
+        with self.assertNumQueries(1):
+            facets = product_facets([self.hair, self.face], query='do', max_price=100)
+
+        self.assertEqual(facets['categories'], [(self.hair, 2), (self.face, 0)])
+        self.assertEqual([count for low, high, count in facets['prices']], [1, 1, 1, 0])
+
+    def test_unfiltered_facets_cached(self):
+        shop_facets([self.hair, self.face])
+
+        with self.assertNumQueries(0):
+            facets = shop_facets([self.hair, self.face])
+        self.assertEqual(facets['categories'], [(self.hair, 2), (self.face, 1)])
+
+        Product.objects.create(name='Serum', description='Do twarzy', price=250).categories.add(self.face)
+        facets = shop_facets([self.hair, self.face])
+        self.assertEqual(facets['categories'], [(self.hair, 2), (self.face, 2)])
+        self.assertEqual([count for low, high, count in facets['prices']], [1, 1, 1, 1])
+
+    def test_filtered_facets_counted_live(self):
+        shop_facets([self.hair, self.face])
+
+        with self.assertNumQueries(1):
+            facets = shop_facets([self.hair, self.face], max_price=100)
+        self.assertEqual(facets['categories'], [(self.hair, 2), (self.face, 0)])
+
+    def test_shop_view(self):
+        for i in range(12):
+            Product.objects.create(name=f'Szampon {i}', description='opis', price=i).categories.add(self.hair)
+
+        response = self.client.get('/shop/', {'query': 'szampon', 'category': self.hair.pk})
+
+        self.assertEqual(len(response.context['shop']), 10)
+        self.assertContains(response, f'query=szampon&amp;category={self.hair.pk}&amp;cursor=')
+        self.assertContains(response, 'Włosy (13)')
+        response = self.client.get('/shop/', {'query': 'krem'})
+        self.assertEqual(list(response.context['shop']), [self.cream])
+        self.assertNotContains(response, 'Szampon ziołowy')
+
+
+class TestBulkReservation(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.category_service = Category_service.objects.create(name='Test Category')
+        self.employee.categories.add(self.category_service)
+        self.services = []
+        for i in range(5):
+            service = Services.objects.create(name=f'Service {i}', price=10.0, duration=60)
+            service.category.add(self.category_service)
+            self.services.append(service)
+        self.monday = date.today() + timedelta(days=7 - date.today().weekday())
+        self.url = reverse('reservation_bulk')
+        self.client.login(username='testuser', password='testpassword')
+
+    def items(self, count):
+        return [{
+            'staff': self.employee.pk,
+            'service': service.pk,
+            'category_service': self.category_service.pk,
+            'date': self.monday.isoformat(),
+            'time': ALL_TIMES[i],
+        } for i, service in enumerate(self.services[:count])]
+
+    def post(self, items):
+        return self.client.post(self.url, json.dumps({'items': items}), content_type='application/json')
+
+    def test_post(self):
+        response = self.post(self.items(3))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['reservations']), 3)
+        reservation = Reservation.objects.get(time=time(8, 0))
+        self.assertEqual(list(reservation.service.all()), [self.services[1]])
+        self.assertEqual(list(reservation.category_service.all()), [self.category_service])
+
+    def test_overlapping_items(self):
+        items = self.items(2)
+        items[1]['time'] = '08:00'
+        self.services[0].duration = 120
+        self.services[0].save()
+
+        response = self.post(items)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_overlapping_existing_reservation(self):
+        long_service = Services.objects.create(name='Long', price=10.0, duration=120)
+        reservation = Reservation.objects.create(client=self.user, staff=self.employee, date=self.monday,
+                                                 time=time(9, 0))
+        reservation.service.add(long_service)
+
+        items = self.items(1)
+        items[0]['time'] = '10:00'
+
+        response = self.post(items)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_constant_query_count(self):
+        # Caches the logged-in user, which the first request after login reads from the database,
+        # and the staff assignments.
+        self.client.get(reverse('home'))
+        staff_category_map()
+        with CaptureQueriesContext(connection) as single:
+            self.post(self.items(1))
+        Reservation.objects.all().delete()
+        with CaptureQueriesContext(connection) as many:
+            self.post(self.items(5))
+
+        self.assertEqual(Reservation.objects.count(), 5)
+        self.assertEqual(len(many), len(single))
+
+    def test_taken_slot_books_nothing(self):
+        Reservation.objects.create(client=self.user, staff=self.employee, date=self.monday, time=time(9, 0))
+
+        response = self.post(self.items(3))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_service_outside_category(self):
+        other = Services.objects.create(name='Other', price=10.0, duration=60)
+        items = self.items(1)
+        items[0]['service'] = other.pk
+
+        response = self.post(items)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_invalid_body(self):
+        response = self.client.post(self.url, 'items', content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+
+
+class TestReservationBookingForm(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.category_service = Category_service.objects.create(name='Fryzjer')
+        self.other_category = Category_service.objects.create(name='Masaż')
+        self.employee = Staff.objects.create(first_name='Anna', last_name='Maria Kowalska', phone='123456789',
+                                             position=4)
+        self.namesake = Staff.objects.create(first_name='Anna', last_name='Maria Kowalska', phone='987654321',
+                                             position=2)
+        self.add_staff(self.employee, self.category_service)
+        self.add_staff(self.namesake, self.other_category)
+        self.service = Services.objects.create(name='Strzyżenie', price=50, duration=60)
+        self.service.category.add(self.category_service)
+        self.other_service = Services.objects.create(name='Strzyżenie', price=80, duration=60)
+        self.other_service.category.add(self.other_category)
+        self.monday = date.today() + timedelta(days=7 - date.today().weekday())
+        self.url = reverse('reservation', args=[self.category_service.pk])
+        self.client.login(username='testuser', password='testpassword')
+
+    def add_staff(self, staff, category_service):
+        staff.categories.add(category_service)
+
+    def data(self, **kwargs):
+        data = {'staff': self.employee.pk, 'service': self.service.pk, 'date': self.monday.isoformat(),
+                'time': '10:00'}
+        data.update(kwargs)
+        return data
+
+    def test_get(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(list(response.context['staff']), [self.employee])
+        self.assertEqual(list(response.context['service']), [self.service])
+
+    def test_post_multi_word_surname(self):
+        response = self.client.post(self.url, self.data())
+
+        self.assertEqual(response.status_code, 200)
+        reservation = Reservation.objects.get()
+        self.assertEqual(reservation.staff, self.employee)
+        self.assertEqual(list(reservation.service.all()), [self.service])
+        self.assertEqual(list(reservation.category_service.all()), [self.category_service])
+
+    def test_post_duplicate_names_outside_category(self):
+        response = self.client.post(self.url, self.data(staff=self.namesake.pk, service=self.other_service.pk))
+
+        self.assertIn('staff', response.context['form'].errors)
+        self.assertIn('service', response.context['form'].errors)
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_post_overlapping_service(self):
+        long_service = Services.objects.create(name='Koloryzacja', price=200, duration=180)
+        long_service.category.add(self.category_service)
+        reservation = Reservation.objects.create(client=self.user, staff=self.employee, date=self.monday,
+                                                 time=time(11, 0))
+        reservation.service.add(self.service)
+
+        response = self.client.post(self.url, self.data(service=long_service.pk, time='09:00'))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_book_reservation_rechecks_schedule(self):
+        # A booking validated before a concurrent one committed must not slip past it.
+        long_service = Services.objects.create(name='Koloryzacja', price=200, duration=180)
+        book_reservation(self.user, self.employee, self.service, self.category_service, self.monday, time(11, 0))
+
+        with self.assertRaises(BookingError) as raised:
+            book_reservation(self.user, self.employee.pk, long_service.pk, self.category_service.pk,
+                             self.monday, time(9, 0))
+
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_post_weekend(self):
+        response = self.client.post(self.url, self.data(date=(self.monday - timedelta(days=1)).isoformat()))
+
+        self.assertIn('date', response.context['form'].errors)
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_choices_cached(self):
+        category_choice_ids(self.category_service.pk)
+        with self.assertNumQueries(0):
+            choices = category_choice_ids(self.category_service.pk)
+        self.assertEqual(choices, {'staff': [self.employee.pk], 'service': [self.service.pk]})
+
+        self.add_staff(self.namesake, self.category_service)
+        self.assertCountEqual(category_choice_ids(self.category_service.pk)['staff'],
+                              [self.employee.pk, self.namesake.pk])
+
+
+class TestStaffCategory(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff_user = User.objects.create_user(username='admin', password='testpassword', is_staff=True)
+        self.category_service = Category_service.objects.create(name='Fryzjer')
+        self.employee = Staff.objects.create(first_name='Anna', last_name='Kowalska', phone='123456789', position=4)
+
+    def test_assignment_is_not_duplicated(self):
+        self.client.login(username='admin', password='testpassword')
+        data = {'category': self.category_service.pk, 'staff': self.employee.pk}
+
+        self.client.post('/add_staff_to_category/', data)
+        response = self.client.post('/add_staff_to_category/', data)
+
+        self.assertContains(response, 'pracownik jest już przypisany do tej kategorii')
+        self.assertEqual(StaffCategory.objects.count(), 1)
+
+    def test_map_rebuilt_on_change(self):
+        other = Staff.objects.create(first_name='Ewa', last_name='Nowak', phone='987654321', position=4)
+        self.employee.categories.add(self.category_service)
+        StaffCategory.objects.create(staff=other, category_service=self.category_service)
+        self.assertEqual(staff_category_map(), {self.category_service.pk: [self.employee.pk, other.pk]})
+
+        with self.assertNumQueries(0):
+            staff_category_map()
+        self.employee.categories.remove(self.category_service)
+        self.assertEqual(staff_category_map(), {self.category_service.pk: [other.pk]})
+        other.delete()
+        self.assertEqual(staff_category_map(), {})
+
+
+class TestStaffCategoryMigration(TransactionTestCase):
+    before = [('beauty_for_you_app', '0010_user_email_lower_idx')]
+    after = [('beauty_for_you_app', '0011_staff_category')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        call_command('migrate', verbosity=0)
+
+    def test_collapses_category_staff_rows(self):
+        apps = self.migrate(self.before)
+        Category_staff = apps.get_model('beauty_for_you_app', 'Category_staff')
+        first = apps.get_model('beauty_for_you_app', 'Category_service').objects.create(name='Fryzjer')
+        second = apps.get_model('beauty_for_you_app', 'Category_service').objects.create(name='Masaż')
+        staff = apps.get_model('beauty_for_you_app', 'Staff').objects.create(
+            first_name='Anna', last_name='Kowalska', phone='123456789', position=4)
+        for category_service in (first, first, second):
+            category_staff = Category_staff.objects.create()
+            category_staff.name.add(category_service)
+            category_staff.staff.add(staff)
+
+        apps = self.migrate(self.after)
+
+        pairs = apps.get_model('beauty_for_you_app', 'StaffCategory').objects.values_list('staff', 'category_service')
+        self.assertCountEqual(pairs, [(staff.pk, first.pk), (staff.pk, second.pk)])
+
+
+class TestSeedCommand(TestCase):
+    def test_seed(self):
+        call_command('seed', staff=3, categories=2, services=4, users=5, products=7, reservations=40,
+                     batch_size=10, stdout=StringIO())
+
+        self.assertEqual(Reservation.objects.count(), 40)
+        self.assertEqual(Reservation.service.through.objects.count(), 40)
+        self.assertEqual(Product.categories.through.objects.count(), 7)
+        self.assertEqual(StaffCategory.objects.count(), 3)
+        slots = set(Reservation.objects.values_list('staff', 'date', 'time'))
+        self.assertEqual(len(slots), 40)
+
+    def test_deterministic(self):
+        options = {'staff': 3, 'services': 4, 'users': 5, 'products': 7, 'reservations': 20,
+                   'anchor_date': date(2024, 3, 4), 'stdout': StringIO()}
+        call_command('seed', **options)
+        first = list(Reservation.objects.order_by('pk').values_list('date', 'time'))
+        call_command('seed', **options)
+        second = list(Reservation.objects.order_by('pk').values_list('date', 'time'))[len(first):]
+
+        self.assertEqual(first, second)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertTrue(all(date(2024, 2, 26) <= day <= date(2024, 3, 11) for day, _ in first))
+
+    def test_reservations_do_not_overlap(self):
+        call_command('seed', staff=2, services=6, users=3, products=1, reservations=60, stdout=StringIO())
+
+        occupied = {}
+        for staff_id, day, start, duration in Reservation.objects.values_list('staff', 'date', 'time',
+                                                                              'service__duration'):
+            mask = slot_mask(start, duration)
+            self.assertFalse(occupied.get((staff_id, day), 0) & mask)
+            self.assertEqual(mask.bit_count(), slots_needed(duration))
+            occupied[(staff_id, day)] = occupied.get((staff_id, day), 0) | mask
+
+
+class TestExports(TestCase):
+    def setUp(self):
+        self.staff_user = User.objects.create_user(username='admin', password='testpassword', is_staff=True)
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.category_service = Category_service.objects.create(name='Paznokcie')
+        self.services = [Services.objects.create(name=f'Usługa {i}', price=10.0, duration=60) for i in range(2)]
+        self.category = Category.objects.create(category_name='Kosmetyki')
+        self.client.force_login(self.staff_user)
+
+    def add_rows(self, count):
+        start = Reservation.objects.count()
+        for i in range(start, start + count):
+            reservation = Reservation.objects.create(client=self.staff_user, staff=self.employee,
+                                                     date=date(2030, 1, 1) + timedelta(days=i), time=time(10, 0))
+            reservation.service.set(self.services)
+            reservation.category_service.add(self.category_service)
+            product = Product.objects.create(name=f'Krem {i}', description='opis, "nowy"', price=10 + i)
+            product.categories.add(self.category)
+
+    def export(self, name, export_format):
+        response = self.client.get(reverse(name, args=[export_format]))
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_reservations_csv(self):
+        self.add_rows(2)
+
+        rows = list(csv.DictReader(StringIO(self.export('export_reservations', 'csv'))))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0], {'id': str(Reservation.objects.order_by('pk').first().pk), 'date': '2030-01-01',
+                                   'time': '10:00:00', 'client': 'admin', 'staff': 'John Doe',
+                                   'services': 'Usługa 0, Usługa 1', 'category_services': 'Paznokcie'})
+
+    def test_products_json(self):
+        self.add_rows(2)
+
+        products = json.loads(self.export('export_products', 'json'))
+
+        self.assertEqual([product['name'] for product in products], ['Krem 0', 'Krem 1'])
+        self.assertEqual(products[0]['description'], 'opis, "nowy"')
+        self.assertEqual(products[0]['categories'], 'Kosmetyki')
+        self.assertEqual(json.loads(self.export('export_reservations', 'json'))[1]['date'], '2030-01-02')
+
+    def test_empty_json(self):
+        self.assertEqual(json.loads(self.export('export_products', 'json')), [])
+
+    def test_constant_queries(self):
+        self.add_rows(1)
+        # Caches the logged-in user, which the first request after login reads from the database,
+        # and the staff assignments.
+        self.client.get(reverse('home'))
+        staff_category_map()
+        with CaptureQueriesContext(connection) as single:
+            self.export('export_reservations', 'csv')
+        self.add_rows(10)
+        with CaptureQueriesContext(connection) as many:
+            self.export('export_reservations', 'csv')
+
+        self.assertEqual(len(many), len(single))
+
+    def test_staff_only(self):
+        self.client.force_login(User.objects.create_user(username='testuser', password='testpassword'))
+
+        response = self.client.get(reverse('export_products', args=['csv']))
+
+        self.assertEqual(response.status_code, 403)
+        self.client.force_login(self.staff_user)
+        self.assertEqual(self.client.get(reverse('export_products', args=['xml'])).status_code, 404)
+
+    async def test_asgi_streams_without_buffering(self):
+        await sync_to_async(self.add_rows)(3)
+        await sync_to_async(self.async_client.force_login)(self.staff_user)
+
+        response = await self.async_client.get(reverse('export_products', args=['csv']))
+
+        self.assertTrue(response.is_async)
+        content = b''.join([block async for block in response.streaming_content]).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual([row['name'] for row in rows], ['Krem 0', 'Krem 1', 'Krem 2'])
+        self.assertEqual(rows[0]['description'], 'opis, "nowy"')
+
+
+MANIFEST_STORAGE = {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'}
+
+
+class TestStaticFiles(TestCase):
+    def manifest_storage(self, root):
+        return override_settings(STATIC_ROOT=root, DEBUG=False,
+                                 STORAGES={**settings.STORAGES, 'staticfiles': MANIFEST_STORAGE})
+
+    def test_collected_assets(self):
+        with tempfile.TemporaryDirectory() as root, self.manifest_storage(root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = staticfiles_storage.url('css/style.css')
+
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='br, gzip')
+            response.close()
+
+        self.assertRegex(url, r'^/static/css/style\.[0-9a-f]{12}\.css$')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_not_collected(self):
+        with tempfile.TemporaryDirectory() as root, self.manifest_storage(root):
+            with self.assertRaises(ValueError):
+                staticfiles_storage.url('css/style.css')
+
+    def test_test_run_uses_plain_names(self):
+        self.assertEqual(staticfiles_storage.url('css/style.css'), '/static/css/style.css')
+
+
+CACHED_SESSIONS = {'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db', 'AUTH_USER_CACHE_TIMEOUT': 300}
+
+
+@override_settings(**CACHED_SESSIONS)
+class TestCachedSessions(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+
+    def test_no_session_or_user_queries(self):
+        self.client.get(reverse('home'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('my_reservation'))
+
+        self.assertEqual(response.context['user'], self.user)
+        self.assertFalse([query['sql'] for query in queries.captured_queries
+                          if 'django_session' in query['sql'] or 'auth_user' in query['sql']])
+
+    def test_password_change_logs_out_other_sessions(self):
+        self.client.get(reverse('home'))
+        self.user.set_password('newpassword')
+        self.user.save()
+
+        response = self.client.get(reverse('my_reservation'))
+
+        self.assertEqual(response.status_code, 302)
+
+    def test_stale_cache_entry_is_not_trusted(self):
+        self.client.get(reverse('home'))
+        User.objects.filter(pk=self.user.pk).update(password='changed-without-signals')
+
+        self.assertEqual(self.client.get(reverse('my_reservation')).status_code, 200)
+        cache.delete(user_cache_key(self.user.pk))
+        self.assertEqual(self.client.get(reverse('my_reservation')).status_code, 302)
+
+    def test_clear_expired_sessions(self):
+        now = timezone.now()
+        for days in (-2, -1, 1):
+            Session.objects.create(session_key=f'session{days}', session_data='', expire_date=now + timedelta(days=days))
+        out = StringIO()
+
+        call_command('clear_expired_sessions', batch_size=1, stdout=out)
+
+        self.assertIn('Deleted 2 expired sessions', out.getvalue())
+        self.assertFalse(Session.objects.filter(expire_date__lt=now).exists())
+        self.assertTrue(Session.objects.filter(session_key='session1').exists())
+
+    def test_cached_inactive_user_is_not_trusted(self):
+        self.client.get(reverse('home'))
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.user.is_active = False
+        cache.set(user_cache_key(self.user.pk), self.user)
+
+        self.assertEqual(self.client.get(reverse('my_reservation')).status_code, 302)
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_cached_user_off(self):
+        self.client.get(reverse('home'))
+
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        self.assertEqual(self.client.get(reverse('my_reservation')).status_code, 200)
+
+    def test_process_local_cache(self):
+        with override_settings(SHARED_CACHE=False):
+            self.assertEqual([error.id for error in check_cached_sessions(None)],
+                             ['beauty_for_you_app.E001', 'beauty_for_you_app.E002'])
+        with override_settings(SHARED_CACHE=True):
+            self.assertEqual(check_cached_sessions(None), [])
+
+
+@override_settings(THROTTLE_RATES={'login_ip': '5/m', 'login_username': '3/m', 'register_ip': '2/h',
+                                   'password_reset_ip': '10/m', 'password_reset_user': '2/m'})
+class TestThrottling(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+
+    def login(self, username, address='127.0.0.1'):
+        return self.client.post(reverse('login'), {'login': username, 'password': 'wrong'}, REMOTE_ADDR=address)
+
+    def test_login_throttled_per_username(self):
+        for address in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            self.assertEqual(self.login('testuser', address).status_code, 200)
+
+        response = self.login('TestUser', '10.0.0.4')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.login('otheruser', '10.0.0.4').status_code, 200)
+
+    def test_login_throttled_per_ip(self):
+        statuses = [self.login(f'user{number}').status_code for number in range(6)]
+
+        self.assertEqual(statuses, [200] * 5 + [429])
+        self.assertEqual(self.login('user6', '10.0.0.1').status_code, 200)
+
+    def test_throttled_login_does_not_authenticate(self):
+        for _ in range(3):
+            self.login('testuser')
+
+        with mock.patch('beauty_for_you_app.views.authenticate') as authenticate:
+            response = self.client.post(reverse('login'), {'login': 'testuser', 'password': 'testpassword'})
+
+        self.assertEqual(response.status_code, 429)
+        authenticate.assert_not_called()
+
+    def test_register_throttled(self):
+        for number in range(3):
+            response = self.client.post(reverse('register'), {
+                'username': f'new{number}', 'email': f'new{number}@example.com', 'password': 'secret',
+                'password_confirmation': 'secret', 'first_name': 'New', 'last_name': 'User',
+            })
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(User.objects.filter(username__startswith='new').count(), 2)
+
+    def test_password_reset_throttled_per_user(self):
+        self.client.login(username='testuser', password='testpassword')
+        data = {'password': 'newpassword', 'password_confirmation': 'other'}
+
+        statuses = [self.client.post(reverse('reset_password'), data).status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_bucket_refills(self):
+        for _ in range(3):
+            self.assertEqual(take_token('test', 'client', '3/m', now=600), 0)
+        self.assertEqual(take_token('test', 'client', '3/m', now=630), 60)
+        # Half of the previous minute still counts, the bucket holds 3 tokens again after a full minute.
+        self.assertEqual(take_token('test', 'client', '3/m', now=690), 0)
+        self.assertGreater(take_token('test', 'client', '3/m', now=691), 0)
+        self.assertEqual(take_token('test', 'client', '3/m', now=780), 0)
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_client_ip_behind_proxy(self):
+        request = RequestFactory().post('/', HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2', REMOTE_ADDR='10.0.0.1')
+
+        self.assertEqual(client_ip(request), '2.2.2.2')
+
+
+class TestEmailLogin(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', email='Test.User@Example.com',
+                                             password='testpassword')
+        self.backend = EmailOrUsernameBackend()
+
+    def test_login_with_mixed_case_email(self):
+        with self.assertNumQueries(1):
+            user = self.backend.authenticate(None, username='test.user@EXAMPLE.com', password='testpassword')
+
+        self.assertEqual(user, self.user)
+
+    def test_login_view_with_email(self):
+        response = self.client.post(reverse('login'), {'login': 'TEST.USER@example.com', 'password': 'testpassword'})
+
+        self.assertRedirects(response, reverse('home'))
+
+    def test_username_and_wrong_password(self):
+        self.assertEqual(self.backend.authenticate(None, username='testuser', password='testpassword'), self.user)
+        with self.assertRaises(PermissionDenied):
+            self.backend.authenticate(None, username='testuser', password='wrong')
+        with self.assertRaises(PermissionDenied):
+            self.backend.authenticate(None, username='nobody@example.com', password='testpassword')
+
+    def test_username_wins_over_email(self):
+        other = User.objects.create_user(username='test.user@example.com', password='otherpassword')
+
+        user = self.backend.authenticate(None, username='test.user@example.com', password='otherpassword')
+
+        self.assertEqual(user, other)
+
+    def test_shared_email_does_not_log_in(self):
+        User.objects.create_user(username='duplicate', email='test.user@example.com', password='testpassword')
+
+        with self.assertRaises(PermissionDenied):
+            self.backend.authenticate(None, username='test.user@example.com', password='testpassword')
+
+    def test_wrong_password_is_hashed_once(self):
+        with mock.patch.object(ModelBackend, 'authenticate') as model_backend:
+            self.assertIsNone(authenticate(None, username='testuser', password='wrong'))
+
+        model_backend.assert_not_called()
+
+    def test_model_backend_session_stays_logged_in(self):
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+
+        response = self.client.get(reverse('my_reservation'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_register_rejects_duplicate_email(self):
+        form = UserCreateForm(data={
+            'username': 'newuser', 'email': 'TEST.user@example.COM', 'password': 'secret',
+            'password_confirmation': 'secret', 'first_name': 'New', 'last_name': 'User',
+        })
+
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+
+    def test_lookup_uses_index(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+        plan = users_with_email('test.user@example.com').explain()
+
+        self.assertIn('user_email_lower_idx', plan)
+
+
+class TestAsyncViews(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.employee = Staff.objects.create(first_name='John', last_name='Doe', phone='123456789', position=1)
+        self.category_service = Category_service.objects.create(name='Test Category')
+        self.employee.categories.add(self.category_service)
+        self.service = Services.objects.create(name='Service', price=10.0, duration=120)
+        self.service.category.add(self.category_service)
+        self.monday = date.today() + timedelta(days=7 - date.today().weekday())
+        self.url = reverse('async_reservation', args=[self.category_service.pk])
+        self.async_client.force_login(self.user)
+
+    def body(self, **kwargs):
+        body = {'staff': self.employee.pk, 'service': self.service.pk,
+                'date': self.monday.isoformat(), 'time': '09:00'}
+        body.update(kwargs)
+        return json.dumps(body)
+
+    async def test_availability_matches_sync_view(self):
+        await Reservation.objects.acreate(client=self.user, staff=self.employee, date=self.monday, time=time(10, 0))
+        query = {'date_from': self.monday.isoformat(), 'date_to': self.monday.isoformat(),
+                 'service': self.service.pk}
+
+        response = await self.async_client.get(reverse('async_availability', args=[self.employee.pk]), query)
+        expected = await sync_to_async(self.client.get)(reverse('availability', args=[self.employee.pk]), query)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected.json())
+        self.assertNotIn('09:00', response.json()['slots'][self.monday.isoformat()])
+
+    async def test_availability_unknown_staff(self):
+        response = await self.async_client.get(reverse('async_availability', args=[self.employee.pk + 1]))
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_post_reservation(self):
+        response = await self.async_client.post(self.url, self.body(), content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        reservation = await Reservation.objects.aget(pk=response.json()['reservation'])
+        self.assertEqual(reservation.client_id, self.user.pk)
+        self.assertEqual(reservation.time, time(9, 0))
+        self.assertTrue(await reservation.service.filter(pk=self.service.pk).aexists())
+
+    async def test_post_overlapping_slot(self):
+        await Reservation.objects.acreate(client=self.user, staff=self.employee, date=self.monday, time=time(10, 0))
+
+        response = await self.async_client.post(self.url, self.body(), content_type='application/json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(await Reservation.objects.acount(), 1)
+
+    async def test_post_time_with_seconds(self):
+        response = await self.async_client.post(self.url, self.body(time='09:00:00'), content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((await Reservation.objects.aget()).time, time(9, 0))
+
+    async def test_post_service_outside_category(self):
+        other = await Services.objects.acreate(name='Other', price=10.0, duration=60)
+
+        response = await self.async_client.post(self.url, self.body(service=other.pk),
+                                                content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+
+    async def test_post_requires_login(self):
+        await sync_to_async(self.async_client.logout)()
+
+        response = await self.async_client.post(self.url, self.body(), content_type='application/json')
+
+        self.assertEqual(response.status_code, 401)
+
+    async def test_my_reservation(self):
+        for hour in range(7, 10):
+            await Reservation.objects.acreate(client=self.user, staff=self.employee, date=self.monday,
+                                              time=time(hour, 0))
+
+        response = await self.async_client.get(reverse('async_my_reservation'))
+
+        data = response.json()
+        self.assertEqual([item['time'] for item in data['reservations']], ['07:00', '08:00', '09:00'])
+        self.assertEqual(data['reservations'][0]['staff'], 'John Doe')
+        self.assertIsNone(data['next'])
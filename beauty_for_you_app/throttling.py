@@ -0,0 +1,110 @@
+import hashlib
+import math
+import time as timer
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .cache import _incr
+
+RATE_PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    """
+    Parses a rate like '10/m' into the number of requests and the period in seconds.
+    """
+    limit, period = rate.split('/')
+    return int(limit), RATE_PERIODS[period[0]]
+
+
+def client_ip(request):
+    """
+    Returns the address of the client, skipping settings.TRUSTED_PROXY_COUNT proxies, e.g. 1 for the
+    Heroku router, which append the address they received the request from to X-Forwarded-For.
+    """
+    if settings.TRUSTED_PROXY_COUNT:
+        forwarded = [address.strip() for address in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        if len(forwarded) >= settings.TRUSTED_PROXY_COUNT and forwarded[-settings.TRUSTED_PROXY_COUNT]:
+            return forwarded[-settings.TRUSTED_PROXY_COUNT]
+    return request.META.get('REMOTE_ADDR')
+
+
+def login_username(request):
+    return request.POST.get('login', '').strip().lower() or None
+
+
+def user_id(request):
+    return request.user.pk
+
+
+# What a request is counted by; settings.THROTTLE_RATES has a rate for every '<scope>_<ident>'.
+THROTTLE_IDENTS = {
+    'ip': client_ip,
+    'username': login_username,
+    'user': user_id,
+}
+
+
+def take_token(scope, ident, rate, now=None):
+    """
+    Takes a token from the bucket of `ident` in `scope`, which holds `rate` tokens and refills
+    evenly over the rate's period. Returns 0 when a token was taken, otherwise the seconds until
+    the next request would be allowed.
+
+    The bucket is estimated from the request counters of the current and the previous period,
+    the previous one weighted by how much of it still overlaps the last `period` seconds. Both
+    counters live in the configured cache and are only changed by atomic increments, so with a
+    shared cache all workers share the buckets without a lock; LocMemCache gives every worker
+    its own buckets, see check_shared_cache. Rejected requests are counted too: a client that
+    keeps flooding stays throttled.
+    """
+    limit, period = parse_rate(rate)
+    now = timer.time() if now is None else now
+    window, elapsed = divmod(now, period)
+    digest = hashlib.sha256(str(ident).encode()).hexdigest()[:32]
+    key = f'throttle:{scope}:{digest}'
+    count = _incr(f'{key}:{int(window)}', timeout=2 * period)
+    previous = cache.get(f'{key}:{int(window) - 1}', 0)
+    if previous * (1 - elapsed / period) + count <= limit:
+        return 0
+    if count < limit:
+        # The previous period drains out before this one ends.
+        wait = period * (1 - (limit - count - 1) / previous) - elapsed
+    else:
+        wait = period - elapsed + period * (1 - (limit - 1) / count)
+    return max(1, math.ceil(wait))
+
+
+def throttled_response(wait):
+    response = HttpResponse(f'Zbyt wiele prób. Spróbuj ponownie za {wait} s.', status=429,
+                            content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(wait)
+    return response
+
+
+def throttle(scope, *idents):
+    """
+    View decorator answering 429 Too Many Requests, with Retry-After, once any bucket of the request
+    is empty; `idents` are keys of THROTTLE_IDENTS.
+
+    Meant for views hashing passwords, which cost tens of milliseconds of CPU per request: a
+    rejected request costs a few cache operations. A rate of None in settings.THROTTLE_RATES
+    turns that bucket off.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            wait = 0
+            for name in idents:
+                rate = settings.THROTTLE_RATES.get(f'{scope}_{name}')
+                ident = THROTTLE_IDENTS[name](request)
+                if rate is not None and ident is not None:
+                    wait = max(wait, take_token(f'{scope}_{name}', ident, rate))
+            if wait:
+                return throttled_response(wait)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,17 +1,36 @@
+import json
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
-from django.shortcuts import render, redirect
+from django.http import Http404, JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.generic import CreateView, DeleteView, FormView, UpdateView, DetailView, ListView
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from .form import AddStaffForm, AddServiceForm, AddCategoryServiceForm, UserCreateForm, LoginForm, \
-    AddCategoryShopForm, AddProductShopForm, UserUpdateForm, PasswordResetForm
-from .models import Staff, Services, Category_service, Reservation, Product, Category_staff
-
-
+    AddCategoryShopForm, AddProductShopForm, UserUpdateForm, PasswordResetForm, ReservationBookingForm, \
+    ReservationRescheduleForm, ProductSearchForm
+from .availability import ALL_TIMES, SLOT_MINUTES, afree_slots, free_slots
+from .booking import BookingError, book_reservation, create_reservations, parse_booking_items, \
+    reschedule_reservation
+from .cache import acategory_choice_ids, get_catalog
+from .conditional import catalog_condition
+from .exports import EXPORT_FORMATS, PRODUCT_FIELDS, RESERVATION_FIELDS, export_response, product_records, \
+    reservation_records
+from .pagination import KeysetPaginator
+from .routers import read_from_replica
+from .search import search_products, shop_facets
+from .throttling import throttle
+from .models import Staff, Services, Category_service, Reservation, Product, StaffCategory, Category, \
+    ReservationArchive
+
+
+@read_from_replica
 def main(request):
     """
     View function for the main page of the application.
@@ -20,7 +39,7 @@ def main(request):
     Returns:
         HttpResponse: An HTTP response containing the 'main.html' template with the 'category_service' context.
     """
-    category_service = Category_service.objects.all()
+    category_service = get_catalog('category_service')
     return render(request, 'main.html', {'category_service': category_service})
 
 
@@ -33,13 +52,27 @@ class StaffRequiredMixin(UserPassesTestMixin, LoginRequiredMixin):
         return self.request.user.is_staff
 
 
+class AsyncLoginRequiredMixin:
+    """
+    Mixin for async JSON views answering 401 to anonymous users.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        # request.user is loaded lazily from the session, which needs the synchronous ORM.
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return JsonResponse({'error': 'Wymagane logowanie'}, status=401)
+        return await super().dispatch(request, *args, **kwargs)
+
+
+@method_decorator(read_from_replica, name='get')
+@method_decorator(catalog_condition(Staff), name='get')
 class StaffView(View):
     """
     The view for the 'staff' view retrieves and displays all data from the 'staff' model."
     """
 
     def get(self, request):
-        staff = Staff.objects.all()
+        staff = get_catalog('staff')
         return render(request, 'staff.html', {'staff': staff, })
 
 
@@ -61,12 +94,14 @@ class AddServiseCreateView(StaffRequiredMixin, CreateView):
     success_url = '/service'
 
 
+@method_decorator(read_from_replica, name='get')
+@method_decorator(catalog_condition(Services, Category_service), name='get')
 class ServiceListView(View):
     """
     The view for the 'service' view retrieves and displays all data from the 'service' model."
     """
     def get(self, request):
-        service = Services.objects.all()
+        service = get_catalog('services')
         return render(request, 'service.html', {'service': service})
 
 
@@ -79,15 +114,18 @@ class AddCategoryServiceCreateView(StaffRequiredMixin, CreateView):
     success_url = '/category_service'
 
 
+@method_decorator(read_from_replica, name='get')
+@method_decorator(catalog_condition(Category_service), name='get')
 class CategoryServiceListView(View):
     """
     The view for the 'Category_service' view retrieves and displays all data from the 'Category_service' model."
     """
     def get(self, request):
-        category = Category_service.objects.all()
+        category = get_catalog('category_service')
         return render(request, 'category.html', {'category': category})
 
 
+@method_decorator(throttle('register', 'ip'), name='post')
 class UserCreateView(FormView):
     """
     A view that handles user registration and account creation.
@@ -103,6 +141,7 @@ class UserCreateView(FormView):
         return super().form_valid(form)
 
 
+@method_decorator(throttle('login', 'ip', 'username'), name='post')
 class LoginView(View):
     """
     A view that handles user login functionality.
@@ -137,45 +176,174 @@ class ReservationCreateView(LoginRequiredMixin, View):
     """
     The view that handles the 'reservation' functionality and allows data to be saved to the database.
     """
-    def get(self, request, category_service_id):
-        user = request.user.username
-        staff = Staff.objects.filter(category_staff__name=category_service_id)
-        service = Services.objects.filter(category=category_service_id)
-        category_service = Category_service.objects.filter(pk=category_service_id)
-        all_times = ('07:00', '08:00', '09:00', '10:00', '11:00', '12:00', '13:00', '14:00', '15:00',)
+    def get_context(self, form, category_service_id, **kwargs):
         context = {
-            'user': user,
-            "staff": staff,
-            'service': service,
-            'category_service': category_service,
-            'all_times': all_times
+            'user': self.request.user.username,
+            'form': form,
+            'staff': form.fields['staff'].queryset,
+            'service': form.fields['service'].queryset,
+            'category_service': get_object_or_404(Category_service, pk=category_service_id),
+            'all_times': ALL_TIMES,
         }
-        return render(request, "reservation.html", context=context)
+        context.update(kwargs)
+        return context
+
+    def get(self, request, category_service_id):
+        form = ReservationBookingForm(category_service_id=category_service_id)
+        return render(request, "reservation.html", context=self.get_context(form, category_service_id))
 
     def post(self, request, category_service_id):
-        client = request.user
-        category_service_name = request.POST.get('category_service')
+        form = ReservationBookingForm(request.POST, category_service_id=category_service_id)
+        if not form.is_valid():
+            error_message = ' '.join(error for errors in form.errors.values() for error in errors)
+            context = self.get_context(form, category_service_id, error_message=error_message)
+            return render(request, 'reservation.html', context)
+
+        data = form.cleaned_data
         try:
-            category_service = Category_service.objects.get(name=category_service_name)
-        except Category_service.DoesNotExist:
-            return render(request, 'reservation.html', {'error_message': 'Nie znaleziono kategorii o podanej nazwie'})
-        staff = request.POST.get('staff')
-        first_name, last_name = staff.split(" ")
-        staff = Staff.objects.get(first_name=first_name, last_name=last_name)
-        service = request.POST.get('service')
-        service_obj = Services.objects.get(name=service)
-        date = request.POST.get('date')
-        time = request.POST.get('time')
-        selected_date = datetime.strptime(date, '%Y-%m-%d').date()
-        if selected_date.weekday() >= 5:
-            return render(request, 'reservation.html', {'error_message': 'Nie pracujemy w weekendy'})
-        elif datetime.strptime(date, '%Y-%m-%d').date() < datetime.now().date():
-            return render(request, 'reservation.html', {'error_message': 'data juz mineła'})
-        else:
-            reservation = Reservation.objects.create(client=client, staff=staff, date=date, time=time)
-            reservation.service.set([service_obj])
-            reservation.category_service.set([category_service])
-        return render(request, "reservation.html", {'message': "Rezerwacja została przyjęta"})
+            book_reservation(request.user, data['staff'], data['service'], category_service_id,
+                             data['date'], data['time'])
+        except BookingError as error:
+            context = self.get_context(form, category_service_id, error_message=error.message)
+            return render(request, 'reservation.html', context, status=error.status)
+        context = self.get_context(ReservationBookingForm(category_service_id=category_service_id),
+                                   category_service_id, message="Rezerwacja została przyjęta")
+        return render(request, "reservation.html", context)
+
+
+class BulkReservationCreateView(LoginRequiredMixin, View):
+    """
+    A view that books several services in one request.
+
+    Expects a JSON body {"items": [{"staff": id, "service": id, "category_service": id,
+    "date": "YYYY-MM-DD", "time": "HH:MM"}, ...]} and creates all reservations or none.
+    """
+    def post(self, request):
+        try:
+            items = json.loads(request.body)['items']
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'Nieprawidłowe dane rezerwacji'}, status=400)
+        try:
+            reservations = create_reservations(request.user, parse_booking_items(items))
+        except BookingError as error:
+            return JsonResponse({'error': error.message}, status=error.status)
+        return JsonResponse({'reservations': [reservation.pk for reservation in reservations]}, status=201)
+
+
+class StaffAvailabilityView(View):
+    """
+    A view that returns free reservation times of a staff member as JSON.
+
+    Query parameters: `date_from` and `date_to` (YYYY-MM-DD, default: the next seven days)
+    and optional `service` id whose duration decides how many consecutive hours are needed.
+    """
+    max_days = 31
+
+    def get_date_range(self):
+        """
+        Returns (date_from, date_to) from the query string, or None if the range is invalid.
+        """
+        try:
+            date_from = datetime.strptime(self.request.GET.get('date_from', ''), '%Y-%m-%d').date()
+        except ValueError:
+            date_from = datetime.now().date()
+        try:
+            date_to = datetime.strptime(self.request.GET.get('date_to', ''), '%Y-%m-%d').date()
+        except ValueError:
+            date_to = date_from + timedelta(days=6)
+        if date_to < date_from or (date_to - date_from).days >= self.max_days:
+            return None
+        return date_from, date_to
+
+    def get_duration_query(self):
+        """
+        Returns a queryset of the requested service's duration, None if no service was requested
+        or False if the service id is invalid.
+        """
+        service_id = self.request.GET.get('service')
+        if not service_id:
+            return None
+        if not service_id.isdigit():
+            return False
+        return Services.objects.filter(pk=service_id).values_list('duration', flat=True)
+
+    def render_slots(self, staff_id, duration, slots):
+        return JsonResponse({
+            'staff': staff_id,
+            'duration': duration,
+            'slots': {day.isoformat(): times for day, times in slots.items()},
+        })
+
+    def get(self, request, staff_id):
+        staff = get_object_or_404(Staff, pk=staff_id)
+        date_range = self.get_date_range()
+        if date_range is None:
+            return JsonResponse({'error': 'Nieprawidłowy zakres dat'}, status=400)
+
+        duration = SLOT_MINUTES
+        duration_query = self.get_duration_query()
+        if duration_query is not None:
+            duration = duration_query.first() if duration_query is not False else None
+            if duration is None:
+                return JsonResponse({'error': 'Nie znaleziono usługi'}, status=400)
+
+        return self.render_slots(staff.pk, duration, free_slots(staff.pk, *date_range, duration))
+
+
+class AsyncStaffAvailabilityView(StaffAvailabilityView):
+    """
+    Async version of StaffAvailabilityView, which does not hold a worker while waiting for the database.
+    """
+
+    async def get(self, request, staff_id):
+        if not await Staff.objects.filter(pk=staff_id).aexists():
+            return JsonResponse({'error': 'Nie znaleziono pracownika'}, status=404)
+        date_range = self.get_date_range()
+        if date_range is None:
+            return JsonResponse({'error': 'Nieprawidłowy zakres dat'}, status=400)
+
+        duration = SLOT_MINUTES
+        duration_query = self.get_duration_query()
+        if duration_query is not None:
+            duration = await duration_query.afirst() if duration_query is not False else None
+            if duration is None:
+                return JsonResponse({'error': 'Nie znaleziono usługi'}, status=400)
+
+        return self.render_slots(staff_id, duration, await afree_slots(staff_id, *date_range, duration))
+
+
+class AsyncReservationCreateView(AsyncLoginRequiredMixin, View):
+    """
+    Async JSON version of ReservationCreateView.
+
+    Expects a body {"staff": id, "service": id, "date": "YYYY-MM-DD", "time": "HH:MM"}
+    and answers 201 with the id of the reservation, or 409 when the time is taken.
+    """
+
+    async def post(self, request, category_service_id):
+        try:
+            body = json.loads(request.body)
+            item, = parse_booking_items([dict(body, category_service=category_service_id)])
+        except (ValueError, TypeError):
+            return JsonResponse({'error': 'Nieprawidłowe dane rezerwacji'}, status=400)
+        except BookingError as error:
+            return JsonResponse({'error': error.message}, status=error.status)
+
+        choices = await acategory_choice_ids(category_service_id)
+        if item['staff'] not in choices['staff'] or item['service'] not in choices['service']:
+            return JsonResponse({'error': 'Nie znaleziono pracownika lub usługi w tej kategorii'}, status=400)
+        duration = await Services.objects.filter(pk=item['service']).values_list('duration', flat=True).aget()
+        free = await afree_slots(item['staff'], item['date'], item['date'], duration)
+        if item['time'].strftime('%H:%M') not in free.get(item['date'], []):
+            return JsonResponse({'error': 'Ten termin jest już zajęty'}, status=409)
+
+        # Many-to-many writes have no async API yet, so the transaction runs in a thread.
+        try:
+            reservation = await sync_to_async(book_reservation)(
+                request.user, item['staff'], item['service'], category_service_id, item['date'], item['time'])
+        except BookingError as error:
+            return JsonResponse({'error': error.message}, status=error.status)
+        return JsonResponse({'reservation': reservation.pk}, status=201)
 
 
 class AddCategoryShopCreateView(StaffRequiredMixin, CreateView):
@@ -196,20 +364,47 @@ class AddProductShopCreateView(StaffRequiredMixin, CreateView):
     success_url = '/shop'
 
 
+@method_decorator(read_from_replica, name='get')
+@method_decorator(catalog_condition(Product, Category), name='get')
 class ShopListView(View):
     """
     A view that displays a paginated list of products in the shop
     """
     def get(self, request):
-        shop = Product.objects.all()
-        paginator = Paginator(shop, 10)
-        page = request.GET.get('page')
-        product_shop = paginator.get_page(page)
+        form = ProductSearchForm(request.GET)
+        filters = {}
+        if form.is_valid():
+            filters = {name: value for name, value in form.cleaned_data.items() if value not in (None, '')}
+        shop = search_products(Product.objects.for_listing(), **filters)
+        paginator = KeysetPaginator(shop, ('price', 'id'), 10)
+        cursor = request.GET.get('cursor')
+        product_shop = paginator.get_page(cursor)
         context = {
-            'shop': product_shop
+            'shop': product_shop,
+            'form': form,
+            'search_query': urlencode(filters),
         }
+        context.update(self.get_facet_links(filters))
         return render(request, 'shop.html', context=context)
 
+    def get_facet_links(self, filters):
+        """
+        Returns the category and price facets with their counts and the query strings selecting them.
+        """
+        facets = shop_facets(get_catalog('shop_categories'), **filters)
+        without_price = {name: value for name, value in filters.items() if name not in ('min_price', 'max_price')}
+        price_links = []
+        for low, high, count in facets['prices']:
+            bounds = {name: value for name, value in (('min_price', low), ('max_price', high)) if value is not None}
+            price_links.append({'low': low, 'high': high, 'count': count,
+                                'query': urlencode(dict(without_price, **bounds))})
+        return {
+            'category_facets': [{'category': category, 'count': count,
+                                 'query': urlencode(dict(filters, category=category.pk))}
+                                for category, count in facets['categories']],
+            'price_facets': price_links,
+        }
+
 
 class UserUpdateView(LoginRequiredMixin, UpdateView):
     """
@@ -235,6 +430,7 @@ class UserDetailView(LoginRequiredMixin, DetailView):
     context_object_name = 'user_obj'
 
 
+@method_decorator(throttle('password_reset', 'ip', 'user'), name='post')
 class PasswordResetView(LoginRequiredMixin, FormView):
     """
     A view that allows authenticated users to reset their password.
@@ -252,18 +448,67 @@ class PasswordResetView(LoginRequiredMixin, FormView):
         return super().form_valid(form)
 
 
+@method_decorator(read_from_replica, name='get')
 class MyReservationView(LoginRequiredMixin, ListView):
     """
-    A view that displays a list of reservations made by the authenticated user.
+    A view that displays the upcoming reservations of the authenticated user, or with
+    `?history=1` their past visits, read from the archive. The visits not archived yet
+    are listed after the archive's last page and paginated with a `pending` query parameter.
     """
     model = Reservation
     template_name = 'my_reservation.html'
     context_object_name = 'reservations'
+    per_page = 10
+
+    @property
+    def history(self):
+        return self.request.GET.get('history') == '1'
 
     def get_queryset(self):
         client = self.request.user
-        queryset = Reservation.objects.filter(client=client)
-        return queryset
+        if self.history:
+            return ReservationArchive.objects.filter(client=client)
+        return Reservation.objects.for_listing().filter(client=client).upcoming().with_start_time()
+
+    def get_context_data(self, **kwargs):
+        ordering = ('date', 'id') if self.history else ('date', 'start_time', 'id')
+        paginator = KeysetPaginator(self.object_list, ordering, self.per_page)
+        page = paginator.get_page(self.request.GET.get('cursor'))
+        kwargs.update(object_list=page, page=page, history=self.history)
+        if self.history:
+            kwargs['archive'] = page
+            # Past visits not archived yet follow the archive on its last page, paginated with their own cursor.
+            pending = []
+            if not page.has_next():
+                queryset = Reservation.objects.for_listing().filter(client=self.request.user).past().with_start_time()
+                paginator = KeysetPaginator(queryset, ('date', 'start_time', 'id'), self.per_page)
+                pending = paginator.get_page(self.request.GET.get('pending'))
+            kwargs.update(reservations=pending, pending=pending)
+        return super().get_context_data(**kwargs)
+
+
+class AsyncMyReservationView(AsyncLoginRequiredMixin, View):
+    """
+    Async JSON version of MyReservationView with the upcoming reservations, paginated with a `cursor` query parameter.
+    """
+    per_page = 10
+
+    async def get(self, request):
+        queryset = Reservation.objects.for_listing().filter(client_id=request.user.pk).upcoming().with_start_time()
+        paginator = KeysetPaginator(queryset, ('date', 'start_time', 'id'), self.per_page)
+        page = await paginator.aget_page(request.GET.get('cursor'))
+        return JsonResponse({
+            'reservations': [{
+                'id': reservation.pk,
+                'date': reservation.date.isoformat(),
+                'time': reservation.time.strftime('%H:%M') if reservation.time else None,
+                'staff': reservation.staff.name,
+                'service': [service.name for service in reservation.service.all()],
+                'category_service': [category.name for category in reservation.category_service.all()],
+            } for reservation in page],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        })
 
 
 class ServiceDeleteView(StaffRequiredMixin, DeleteView):
@@ -321,10 +566,9 @@ class AddStaffToCategoryView(StaffRequiredMixin, View):
         category_service = request.POST.get('category')
         staff = request.POST.get('staff')
         if category_service and staff:
-            category_staff = Category_staff.objects.create()
-            category_staff.name.set([category_service])
-            category_staff.staff.set([staff])
-            return render(request, 'add_staff_to_category.html', {'message': 'pracownik dodany'})
+            _, created = StaffCategory.objects.get_or_create(staff_id=staff, category_service_id=category_service)
+            message = 'pracownik dodany' if created else 'pracownik jest już przypisany do tej kategorii'
+            return render(request, 'add_staff_to_category.html', {'message': message})
         else:
             return render(request, 'add_staff_to_category.html', {'message': 'Wystąpił błąd. Spróbuj ponownie.'})
 
@@ -338,25 +582,31 @@ class ReservationDeleteView(LoginRequiredMixin, DeleteView):
     success_url = '/my_reservation'
 
 
-class ReservationUpdateView(View):
+class ReservationUpdateView(LoginRequiredMixin, View):
     """
-    A view that allows users to update their reservation
+    A view that allows users to move their reservation to another date and time
     """
+    def get_context(self, reservation, **kwargs):
+        context = {'reservation': reservation, 'all_times': ALL_TIMES}
+        context.update(kwargs)
+        return context
+
     def get(self, request, reservation_id):
-        reservation = Reservation.objects.get(pk=reservation_id)
-        all_times = ('07:00', '08:00', '09:00', '10:00', '11:00', '12:00', '13:00', '14:00', '15:00',)
-        return render(request, 'reservation_update.html', {'reservation': reservation, 'all_times': all_times})
+        reservation = get_object_or_404(Reservation, pk=reservation_id, client=request.user)
+        return render(request, 'reservation_update.html', self.get_context(reservation))
 
     def post(self, request, reservation_id):
-        date = request.POST.get('date')
-        time = request.POST.get('time')
-        selected_date = datetime.strptime(date, '%Y-%m-%d').date()
-        if selected_date.weekday() >= 5:
-            return render(request, 'reservation_update.html', {'error_message': 'Nie pracujemy w weekendy'})
-        elif datetime.strptime(date, '%Y-%m-%d').date() < datetime.now().date():
-            return render(request, 'reservation_update.html', {'error_message': 'data juz mineła'})
-        else:
-            reservation = Reservation.objects.update(date=date, time=time)
+        reservation = get_object_or_404(Reservation, pk=reservation_id, client=request.user)
+        form = ReservationRescheduleForm(request.POST)
+        if not form.is_valid():
+            error_message = ' '.join(error for errors in form.errors.values() for error in errors)
+            return render(request, 'reservation_update.html',
+                          self.get_context(reservation, error_message=error_message))
+        try:
+            reschedule_reservation(request.user, reservation_id, form.cleaned_data['date'], form.cleaned_data['time'])
+        except BookingError as error:
+            return render(request, 'reservation_update.html',
+                          self.get_context(reservation, error_message=error.message), status=error.status)
         return redirect("my_reservation")
 
 
@@ -387,3 +637,23 @@ class ProductDeleteView(StaffRequiredMixin, DeleteView):
     model = Product
     template_name = 'delete.html'
     success_url = '/shop'
+
+
+class ReservationExportView(StaffRequiredMixin, View):
+    """
+    Streams all reservations as CSV or JSON, for staff.
+    """
+    def get(self, request, export_format):
+        if export_format not in EXPORT_FORMATS:
+            raise Http404
+        return export_response(request, reservation_records(), RESERVATION_FIELDS, 'reservations', export_format)
+
+
+class ProductExportView(StaffRequiredMixin, View):
+    """
+    Streams all shop products as CSV or JSON, for staff.
+    """
+    def get(self, request, export_format):
+        if export_format not in EXPORT_FORMATS:
+            raise Http404
+        return export_response(request, product_records(), PRODUCT_FIELDS, 'products', export_format)
@@ -0,0 +1,10 @@
+import multiprocessing
+import os
+
+# Serve the ASGI application with uvicorn workers, so async views handle many
+# requests per worker while they wait for the database.
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = 'uvicorn.workers.UvicornWorker'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
@@ -25,7 +25,8 @@ from beauty_for_you_app.views import main, AddStaffListView, StaffView, AddCateg
     AddCategoryShopCreateView, AddProductShopCreateView, ShopListView, UserUpdateView, UserDetailView, \
     PasswordResetView, MyReservationView, ServiceDeleteView, StaffDeleteView, AddStaffToCategoryView, \
     ReservationDeleteView, ReservationUpdateView, StaffUpdateView, ProductUpdateView, ProductDeleteView, \
-    ServiceUpdateView
+    ServiceUpdateView, StaffAvailabilityView, BulkReservationCreateView, AsyncStaffAvailabilityView, \
+    AsyncReservationCreateView, AsyncMyReservationView, ReservationExportView, ProductExportView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -40,6 +41,12 @@ urlpatterns = [
     path('accounts/login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('reservation/<int:category_service_id>/', ReservationCreateView.as_view(), name='reservation'),
+    path('reservation/bulk/', BulkReservationCreateView.as_view(), name='reservation_bulk'),
+    path('availability/<int:staff_id>/', StaffAvailabilityView.as_view(), name='availability'),
+    path('api/availability/<int:staff_id>/', AsyncStaffAvailabilityView.as_view(), name='async_availability'),
+    path('api/reservation/<int:category_service_id>/', AsyncReservationCreateView.as_view(),
+         name='async_reservation'),
+    path('api/my_reservation/', AsyncMyReservationView.as_view(), name='async_my_reservation'),
     path('add_category_shop/', AddCategoryShopCreateView.as_view()),
     path('add_product_shop/', AddProductShopCreateView.as_view()),
     path('shop/', ShopListView.as_view()),
@@ -56,5 +63,7 @@ urlpatterns = [
     path('update_staff/<int:pk>', StaffUpdateView.as_view()),
     path('shop_update_product/<int:pk>/', ProductUpdateView.as_view()),
     path('shop_delete_product/<int:pk>/', ProductDeleteView.as_view()),
-    path('update_service/<int:pk>/', ServiceUpdateView.as_view(), name='service_update')
+    path('update_service/<int:pk>/', ServiceUpdateView.as_view(), name='service_update'),
+    path('export/reservations/<str:export_format>/', ReservationExportView.as_view(), name='export_reservations'),
+    path('export/products/<str:export_format>/', ProductExportView.as_view(), name='export_products'),
 ]